@@ -1,6 +1,10 @@
 from fastapi import APIRouter
 
+from app.api.v1.endpoints import documents, files
+
 api_router = APIRouter()
+api_router.include_router(documents.router, prefix="/documents", tags=["documents"])
+api_router.include_router(files.router, prefix="/files", tags=["files"])
 
 # Health check endpoint
 @api_router.get("/health")
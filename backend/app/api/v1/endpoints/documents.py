@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Query, Request, Response, status
+
+from app.services.upload_service import UploadService
+
+router = APIRouter()
+
+
+@router.post("/upload", status_code=status.HTTP_201_CREATED)
+async def upload_document(
+    request: Request,
+    response: Response,
+    filename: str = Query(..., description="Original file name; its extension must match the content")
+):
+    """Stream a document in the raw request body into the document store.
+
+    Identical content is stored once; re-uploads return the existing entry
+    with 200 instead of 201.
+    """
+    content_length = request.headers.get("content-length")
+    upload = await UploadService().save_stream(
+        request.stream(),
+        filename,
+        int(content_length) if content_length and content_length.isdigit() else None
+    )
+    if upload.duplicate:
+        response.status_code = status.HTTP_200_OK
+    return upload.to_dict()
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Request
+
+from app.core.exceptions import DocumentComplianceException
+from app.core.storage import get_storage
+
+router = APIRouter()
+
+# Storage areas that can be downloaded; uploads and templates stay private
+DOWNLOAD_AREAS = ("certified", "reports", "visualizations")
+
+
+@router.get("/{area}/{key:path}")
+async def download_file(area: str, key: str, request: Request):
+    """Download a certified file, report or visualization.
+
+    Served by the storage backend: streamed with Range support, handed to
+    nginx via X-Accel-Redirect, or redirected to a presigned S3 URL.
+    """
+    if area not in DOWNLOAD_AREAS:
+        raise DocumentComplianceException(f"Unknown storage area '{area}'", status_code=404)
+    return await get_storage().response(area, key, request)
@@ -32,6 +32,17 @@ class Settings(BaseSettings):
     DB_HOST: str = "localhost"
     DB_PORT: int = 5432
     
+    DB_ECHO: bool = False  # Log every SQL statement
+    
+    # Database Connection Pool
+    DB_POOL_PROFILE: str = "api"  # Options: "api", "null" (no pooling; Celery workers, scripts)
+    DB_POOL_SIZE: int = 10  # Connections kept open by the API process
+    DB_MAX_OVERFLOW: int = 20  # Extra connections the API may open under bursts
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Replace connections older than this (seconds)
+    DB_POOL_PRE_PING: bool = True  # Check connections before use
+    DB_STATEMENT_CACHE_SIZE: int = 100  # Prepared statements cached per connection (0 for PgBouncer)
+    
     # Constructed database URL
     DATABASE_URL: Optional[str] = None
     
@@ -50,8 +61,14 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379"
     REDIS_PASSWORD: Optional[str] = None
     
+    # Validation Pipeline (Celery)
+    CELERY_BROKER_URL: Optional[str] = None  # Defaults to REDIS_URL
+    CELERY_RESULT_BACKEND: Optional[str] = None  # Defaults to REDIS_URL
+    CELERY_PRELOAD_MODELS: bool = True  # Load models in each worker process before its first task
+    
     # File Storage Configuration (Local instead of Azure)
-    STORAGE_TYPE: str = "local"  # Options: "local", "s3", "gcs"
+    STORAGE_TYPE: str = "local"  # Options: "local", "s3"
+    STORAGE_ACCEL_REDIRECT_PREFIX: Optional[str] = None  # nginx internal location serving local files, e.g. "/protected"
     LOCAL_STORAGE_PATH: str = "./uploads"
     TEMPLATES_PATH: str = "./uploads/templates"
     DOCUMENTS_PATH: str = "./uploads/documents"
@@ -59,6 +76,20 @@ class Settings(BaseSettings):
     REPORTS_PATH: str = "./uploads/reports"
     VISUALIZATIONS_PATH: str = "./uploads/visualizations"
     TEMP_PATH: str = "./uploads/temp"
+    ANALYSIS_RESULTS_PATH: str = "./uploads/results"  # Stored analysis results (binary columnar format)
+    ANALYSIS_RESULTS_RETENTION: int = 86400  # Seconds pipeline results are kept after validation (0 = forever)
+    
+    # S3-compatible Storage (STORAGE_TYPE=s3)
+    S3_BUCKET: Optional[str] = None
+    S3_PREFIX: str = ""  # Key prefix inside the bucket
+    S3_ENDPOINT_URL: Optional[str] = None  # e.g. http://minio:9000 for a local stand-in
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_PRESIGNED_URL_TTL: int = 900  # Seconds download links stay valid
+    S3_MULTIPART_THRESHOLD: int = 8388608  # Files above 8MB are uploaded in parts
+    S3_MULTIPART_CHUNKSIZE: int = 8388608
+    S3_MAX_CONCURRENCY: int = 8  # Parts uploaded in parallel
     
     # File Upload Settings
     MAX_UPLOAD_SIZE: int = 52428800  # 50MB in bytes
@@ -66,13 +97,31 @@ class Settings(BaseSettings):
     UPLOAD_PATH: str = "uploads"
     
     # Document Processing Configuration
-    OCR_ENGINE: str = "tesseract"  # Options: "tesseract", "easyocr"
+    OCR_ENGINE: str = "tesseract"  # Options: "tesseract", "tesserocr", "easyocr"
+    TEXT_EXTRACTION_MODE: str = "auto"  # Options: "auto", "native", "ocr"
+    STYLE_COLOR_MODE: str = "sampled"  # Options: "sampled", "full"
+    STYLE_COLOR_PIXEL_BUDGET: int = 50000  # Pixels clustered per page in "sampled" mode
     OCR_LANGUAGES: List[str] = ["eng", "ara"]  # English and Arabic
     LAYOUT_MODEL: str = "lp://EfficientDete/PubLayNet"
+    LAYOUT_BATCH_SIZE: int = 4  # Pages per layout model batch (1 disables batching)
+    LAYOUT_BATCH_MAX_WAIT_MS: int = 25  # How long a batch waits for more pages
+    PDF_RENDER_ENGINE: str = "pymupdf"  # Options: "pymupdf", "pdf2image"
+    PDF_RENDER_DPI: int = 300
+    ANALYSIS_RENDER_DPI: int = 150  # Layout/table/style resolution; OCR regions use PDF_RENDER_DPI (0 = single resolution)
+    PRELOAD_MODELS: bool = False  # Load layout model and probe Tesseract at startup
     
     # Template Processing
     TEMPLATE_CACHE_TTL: int = 3600  # 1 hour
     MAX_CONCURRENT_VALIDATIONS: int = 10
+    TEMPLATE_CANDIDATES_TOP_K: int = 10  # Templates compared in full against each submission
+    TEMPLATE_HASH_MAX_DISTANCE: int = 24  # Max page pHash Hamming distance (of 64 bits) for a candidate
+    
+    # Analysis Result Cache
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_PAGE_CACHE_ENABLED: bool = True  # Reuse unchanged pages of resubmissions
+    ANALYSIS_CACHE_REDIS: bool = True  # Share cached results through REDIS_URL
+    ANALYSIS_CACHE_PATH: str = "./uploads/cache"
+    ANALYSIS_CACHE_MAX_BYTES: int = 1073741824  # 1GB local disk tier
     
     # Validation Settings
     DEFAULT_SIMILARITY_THRESHOLD: float = 0.85
@@ -95,6 +144,7 @@ class Settings(BaseSettings):
     # Performance Settings
     WORKER_CONNECTIONS: int = 4
     WORKER_TIMEOUT: int = 300
+    PAGE_WORKERS: int = 0  # Process pool size for per-page analysis (0 = in-process)
     
     # Monitoring
     ENABLE_METRICS: bool = True
@@ -113,7 +163,9 @@ class Settings(BaseSettings):
             self.CERTIFIED_PATH,
             self.REPORTS_PATH,
             self.VISUALIZATIONS_PATH,
-            self.TEMP_PATH
+            self.TEMP_PATH,
+            self.ANALYSIS_RESULTS_PATH,
+            self.ANALYSIS_CACHE_PATH
         ]
         
         for directory in directories:
@@ -0,0 +1,266 @@
+"""
+Content-addressed cache for document analysis results
+Two tiers: Redis (shared between API and workers) and a size-bounded local disk LRU
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Optional, Dict, Any, List
+
+import redis
+from PIL import Image
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached result layout changes so stale entries are ignored
+CACHE_FORMAT_VERSION = 1
+
+# Seconds to wait before retrying Redis after a connection failure
+REDIS_RETRY_INTERVAL = 30
+
+_caches: Dict[str, "AnalysisCache"] = {}
+_cache_lock = threading.Lock()
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash: str, features: List[str], engine_config: Dict[str, Any]) -> str:
+    """Build a cache key from file content, requested features and engine config"""
+    payload = json.dumps(
+        {
+            "version": CACHE_FORMAT_VERSION,
+            "content": content_hash,
+            "features": sorted(features),
+            "engine": engine_config
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _json_default(obj: Any) -> Any:
+    """Serialize NumPy scalars and arrays returned by the analysis libraries"""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class AnalysisCache:
+    """Two-tier (Redis + local disk) cache of analysis results"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        ttl: int,
+        max_bytes: int,
+        redis_url: Optional[str] = None,
+        redis_password: Optional[str] = None,
+        namespace: str = "analysis"
+    ):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+
+        self._redis = None
+        if redis_url:
+            self._redis = redis.Redis.from_url(
+                redis_url,
+                password=redis_password or None,
+                socket_connect_timeout=0.5,
+                socket_timeout=2
+            )
+        self._redis_retry_at = 0.0
+
+        self._disk_lock = threading.Lock()
+        self._disk_usage: Optional[int] = None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached result"""
+        return await asyncio.to_thread(self.get_sync, key)
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        """Store a result in every tier"""
+        await asyncio.to_thread(self.set_sync, key, value)
+
+    def get_sync(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached result, checking local disk before Redis"""
+        blob = self._disk_get(key)
+        if blob is None:
+            blob = self._redis_get(key)
+            if blob is None:
+                return None
+            # Promote to the local tier for the next lookup
+            self._disk_set(key, blob)
+
+        try:
+            entry = json.loads(zlib.decompress(blob))
+        except (zlib.error, ValueError) as e:
+            logger.warning(f"Discarding corrupt cache entry {key}: {e}")
+            self._disk_delete(key)
+            return None
+
+        if time.time() - entry["created_at"] > self.ttl:
+            self._disk_delete(key)
+            return None
+
+        return entry["value"]
+
+    def set_sync(self, key: str, value: Dict[str, Any]):
+        """Store a result in every tier"""
+        entry = {"created_at": time.time(), "value": value}
+        blob = zlib.compress(json.dumps(entry, default=_json_default).encode("utf-8"))
+        self._disk_set(key, blob)
+        self._redis_set(key, blob)
+
+    # Redis tier
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _redis_available(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, e: Exception):
+        logger.warning(f"Redis analysis cache unavailable, retrying in {REDIS_RETRY_INTERVAL}s: {e}")
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+
+    def _redis_get(self, key: str) -> Optional[bytes]:
+        if not self._redis_available():
+            return None
+        try:
+            return self._redis.get(self._redis_key(key))
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return None
+
+    def _redis_set(self, key: str, blob: bytes):
+        if not self._redis_available():
+            return
+        try:
+            # Redis handles its own eviction (maxmemory-policy); we only set the TTL
+            self._redis.setex(self._redis_key(key), self.ttl, blob)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    # Local disk tier
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, self.namespace, key[:2], f"{key}.json.z")
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            # Bump the mtime so eviction treats it as recently used
+            os.utime(path)
+            return blob
+        except OSError:
+            return None
+
+    def _disk_set(self, key: str, blob: bytes):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write analysis cache entry {key}: {e}")
+            return
+
+        with self._disk_lock:
+            if self._disk_usage is None:
+                self._disk_usage = self._scan_disk_usage()
+            else:
+                self._disk_usage += len(blob)
+            if self._disk_usage > self.max_bytes:
+                self._evict()
+
+    def _disk_delete(self, key: str):
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _iter_disk_entries(self):
+        root = os.path.join(self.cache_dir, self.namespace)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if not filename.endswith(".json.z"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _scan_disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._iter_disk_entries())
+
+    def _evict(self):
+        """Delete least recently used entries until usage drops below 90% of the limit"""
+        entries = sorted(self._iter_disk_entries(), key=lambda e: e[2])
+        usage = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+
+        for path, size, _ in entries:
+            if usage <= target:
+                break
+            try:
+                os.remove(path)
+                usage -= size
+            except OSError:
+                pass
+
+        self._disk_usage = usage
+        logger.debug(f"Analysis cache evicted down to {usage} bytes")
+
+
+def hash_image(image: Image.Image) -> str:
+    """Return the SHA-256 hex digest of a rasterized page's pixels"""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.width}x{image.height}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def get_analysis_cache(namespace: str = "analysis") -> AnalysisCache:
+    """Return the process-wide cache for a namespace, configured from settings
+    
+    Namespaces: "analysis" holds whole-document results, "page" holds
+    single-page results reused across edited resubmissions.
+    """
+    with _cache_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = AnalysisCache(
+                cache_dir=settings.ANALYSIS_CACHE_PATH,
+                ttl=settings.TEMPLATE_CACHE_TTL,
+                max_bytes=settings.ANALYSIS_CACHE_MAX_BYTES,
+                redis_url=settings.REDIS_URL if settings.ANALYSIS_CACHE_REDIS else None,
+                redis_password=settings.REDIS_PASSWORD,
+                namespace=namespace
+            )
+            _caches[namespace] = cache
+        return cache
@@ -0,0 +1,176 @@
+"""
+Bounded executor for document analysis called from the API
+Analysis is CPU-bound (rendering, OCR, layout inference, clustering), so it
+runs on a fixed pool of threads behind an asyncio semaphore sized by
+MAX_CONCURRENT_VALIDATIONS; the event loop only waits on it. Calls time out
+after WORKER_TIMEOUT and cancelled or timed-out work is asked to stop
+between pages
+Each analysis thread keeps one event loop for its lifetime, and every loop
+hands its blocking page work to one shared, bounded page thread pool, so
+per-thread state such as OCR engine handles survives across documents
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+from app.core.exceptions import DocumentComplianceException
+
+logger = logging.getLogger(__name__)
+
+# Executor shared by every request in this process
+_executor: Optional["AnalysisExecutor"] = None
+_executor_lock = threading.Lock()
+
+# Threads running page work (asyncio.to_thread) for every analysis loop
+_page_pool: Optional[ThreadPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+
+# Event loop owned by each thread that runs analysis synchronously
+_thread_state = threading.local()
+
+
+def get_page_thread_pool() -> ThreadPoolExecutor:
+    """Return the process-wide pool for page work
+
+    Sized so every concurrent validation can keep a full layout batch of
+    pages in flight.
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.MAX_CONCURRENT_VALIDATIONS) * max(1, settings.LAYOUT_BATCH_SIZE),
+                thread_name_prefix="analysis-page"
+            )
+        return _page_pool
+
+
+def run_in_thread_loop(coro: Awaitable[Any]) -> Any:
+    """Run a coroutine to completion on the calling thread's long-lived event loop
+
+    Unlike asyncio.run() the loop, and with it the page thread pool it
+    uses as default executor, is kept for the next call.
+    """
+    loop = getattr(_thread_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(get_page_thread_pool())
+        _thread_state.loop = loop
+    return loop.run_until_complete(coro)
+
+
+class AnalysisExecutor:
+    """Runs blocking analysis calls off the event loop with admission control
+
+    At most max_concurrent calls run at once; the rest wait on the
+    semaphore and are counted as queued. A slot is only freed once its
+    thread has actually finished, so abandoned work still counts against
+    the limit until it winds down.
+    """
+
+    def __init__(self, max_concurrent: int, timeout: Optional[float] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="analysis")
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._queued = 0
+        self._running = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls waiting for a free slot"""
+        return self._queued
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "running": self._running,
+            "queued": self._queued,
+            "max_concurrent": self.max_concurrent
+        }
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Call func(*args, cancel_event=..., **kwargs) on the pool and await its result
+
+        func should return soon after its cancel_event is set. Raises a
+        504 DocumentComplianceException when the call (including time spent
+        queued) exceeds timeout, default WORKER_TIMEOUT (0 = no limit).
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = loop.time() + timeout if timeout else None
+
+        self._queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self._remaining(loop, deadline))
+        except asyncio.TimeoutError:
+            raise self._timeout_error(timeout)
+        finally:
+            self._queued -= 1
+
+        cancel_event = threading.Event()
+        self._running += 1
+        try:
+            future = loop.run_in_executor(
+                self._executor, functools.partial(func, *args, cancel_event=cancel_event, **kwargs)
+            )
+        except BaseException:
+            self._finished()
+            raise
+        future.add_done_callback(self._on_done)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self._remaining(loop, deadline))
+        except asyncio.TimeoutError:
+            cancel_event.set()
+            raise self._timeout_error(timeout)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+
+    def _remaining(self, loop: asyncio.AbstractEventLoop, deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        return max(deadline - loop.time(), 0)
+
+    def _timeout_error(self, timeout: float) -> DocumentComplianceException:
+        return DocumentComplianceException(f"Document analysis timed out after {timeout}s", status_code=504)
+
+    def _on_done(self, future: asyncio.Future):
+        """Free the slot once the thread is done, whether or not anyone still awaits it"""
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"Analysis call ended with {future.exception()!r}")
+        self._finished()
+
+    def _finished(self):
+        self._running -= 1
+        self._semaphore.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_analysis_executor() -> AnalysisExecutor:
+    """Return the process-wide analysis executor"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = AnalysisExecutor(settings.MAX_CONCURRENT_VALIDATIONS, settings.WORKER_TIMEOUT)
+        return _executor
+
+
+def shutdown_analysis_executor():
+    """Stop the analysis threads, e.g. on application shutdown"""
+    global _executor, _page_pool
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+    with _page_pool_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=False, cancel_futures=True)
+            _page_pool = None
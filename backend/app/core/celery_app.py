@@ -0,0 +1,303 @@
+"""
+Celery application for the document validation pipeline
+A submission runs as a chain of stages, each on its own queue:
+rasterize (render every page once) -> analysis (one task per page, fanned out
+as a chord and aggregated) -> scoring -> certification
+Stages pass small JSON job records; page renders live in a job directory
+under TEMP_PATH and the aggregated analysis in the result store, both shared
+by the API and all workers; stored analyses are removed when a job fails and
+ANALYSIS_RESULTS_RETENTION seconds after it finishes
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from celery import Celery, chain, chord
+from celery.result import AsyncResult
+from celery.signals import worker_process_init
+from kombu import Queue
+from PIL import Image
+
+from app.config import settings
+from app.core.analysis_cache import _json_default, hash_file, make_cache_key
+from app.core.page_raster import fitz_lock
+from app.core.result_store import ResultStore
+from app.core.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# One queue per pipeline stage, so each can get dedicated workers (`-Q`)
+RASTERIZE_QUEUE = "rasterize"
+ANALYSIS_QUEUE = "analysis"
+SCORING_QUEUE = "scoring"
+CERTIFICATION_QUEUE = "certification"
+PIPELINE_QUEUES = (RASTERIZE_QUEUE, ANALYSIS_QUEUE, SCORING_QUEUE, CERTIFICATION_QUEUE)
+
+# Features analyzed for validation when the caller does not choose
+DEFAULT_PIPELINE_FEATURES = ["layout", "text", "tables", "style"]
+
+celery_app = Celery(
+    "document_compliance",
+    broker=settings.CELERY_BROKER_URL or settings.REDIS_URL,
+    backend=settings.CELERY_RESULT_BACKEND or settings.REDIS_URL
+)
+
+celery_app.conf.update(
+    task_queues=[Queue(name) for name in PIPELINE_QUEUES],
+    task_default_queue=ANALYSIS_QUEUE,
+    task_routes={
+        "pipeline.rasterize_document": {"queue": RASTERIZE_QUEUE},
+        "pipeline.analyze_page": {"queue": ANALYSIS_QUEUE},
+        "pipeline.aggregate_analysis": {"queue": ANALYSIS_QUEUE},
+        "pipeline.score_document": {"queue": SCORING_QUEUE},
+        "pipeline.certify_document": {"queue": CERTIFICATION_QUEUE},
+        "pipeline.cleanup_job": {"queue": CERTIFICATION_QUEUE}
+    },
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    # Stage tasks are killed after WORKER_TIMEOUT; the soft limit fires first so they can clean up
+    task_time_limit=settings.WORKER_TIMEOUT,
+    task_soft_time_limit=max(settings.WORKER_TIMEOUT - min(30, settings.WORKER_TIMEOUT // 10), 1),
+    # Each worker runs at most MAX_CONCURRENT_VALIDATIONS tasks and reserves none beyond them
+    worker_concurrency=settings.MAX_CONCURRENT_VALIDATIONS,
+    worker_prefetch_multiplier=1,
+    # Pages of a worker that dies are redelivered instead of lost
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    task_track_started=True
+)
+
+# Client owned by each worker process, built on first use
+_worker_client = None
+
+
+def get_worker_client():
+    """Return this worker process's document client"""
+    global _worker_client
+    if _worker_client is None:
+        from app.core.opensource_document_client import OpenSourceDocumentClient
+
+        # Celery already runs one page per worker process
+        _worker_client = OpenSourceDocumentClient({"page_workers": 0})
+    return _worker_client
+
+
+@worker_process_init.connect
+def _preload_worker_models(**kwargs):
+    """Load the layout model and OCR engine before the first task"""
+    if not settings.CELERY_PRELOAD_MODELS:
+        return
+    try:
+        get_worker_client().preload()
+    except Exception as e:
+        logger.warning(f"Could not preload models in worker: {e}")
+
+
+@worker_process_init.connect
+def _reset_db_pool(**kwargs):
+    """Drop database connections inherited from the parent across fork"""
+    session = sys.modules.get("app.db.session")
+    if session is not None:
+        session.engine.sync_engine.dispose(close=False)
+
+
+def _job_dir(job: Dict[str, Any]) -> str:
+    return os.path.join(settings.TEMP_PATH, "pipeline", job["job_id"])
+
+
+def _page_image_path(job: Dict[str, Any], page_index: int) -> str:
+    return os.path.join(_job_dir(job), f"page-{page_index + 1:04d}.png")
+
+
+def _store_analysis(job: Dict[str, Any], layout_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Persist the document analysis under the job's id for later stages and reports"""
+    ResultStore().save(job["job_id"], layout_data)
+    return {**job, "result_key": job["job_id"]}
+
+
+def submit_validation(
+    document_path: str,
+    features: Optional[List[str]] = None,
+    template_id: Optional[str] = None,
+    content_hash: Optional[str] = None
+) -> AsyncResult:
+    """Queue a document for validation and return the pipeline's result handle
+
+    The result is the certify_document() record. Without template_id the
+    document is scored against its closest templates. content_hash is the
+    file's SHA-256 when already known, e.g. from the upload store.
+    """
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "document_path": os.path.abspath(document_path),
+        "features": features or DEFAULT_PIPELINE_FEATURES,
+        "template_id": template_id,
+        "content_hash": content_hash
+    }
+    pipeline = chain(
+        rasterize_document.s(job),
+        score_document.s(),
+        certify_document.s()
+    )
+    pipeline.on_error(cleanup_job.si(job))
+    return pipeline.apply_async()
+
+
+@celery_app.task(name="pipeline.rasterize_document", bind=True)
+def rasterize_document(self, job: Dict[str, Any]):
+    """Render every page once, then fan page analysis out as a chord
+
+    Documents with a cached analysis skip the analysis stage entirely.
+    """
+    import fitz
+
+    client = get_worker_client()
+    document_path = job["document_path"]
+    os.makedirs(_job_dir(job), exist_ok=True)
+
+    job = {**job, "content_hash": job.get("content_hash") or hash_file(document_path)}
+    cache_key = None
+    if client.cache is not None:
+        cache_key = make_cache_key(job["content_hash"], job["features"], client._engine_signature())
+        cached = client.cache.get_sync(cache_key)
+        if cached is not None:
+            logger.info(f"Analysis cache hit for {document_path}")
+            cached["document_metadata"]["filename"] = os.path.basename(document_path)
+            cached["document_metadata"]["analysis_cache"] = {
+                "document_hit": True,
+                "page_hits": 0,
+                "page_misses": 0
+            }
+            return _store_analysis(job, cached)
+    job = {**job, "cache_key": cache_key}
+
+    # Images are analyzed straight from the upload
+    page_count = 1
+    if document_path.lower().endswith('.pdf'):
+        with fitz_lock:
+            pdf_document = fitz.open(document_path)
+        try:
+            job["metadata"] = client._extract_metadata(document_path, pdf_document)
+            page_count = job["metadata"]["pages"]
+            for page_index in range(page_count):
+                image = client.render_page(document_path, page_index, pdf_document)
+                image.save(_page_image_path(job, page_index), compress_level=1)
+                image.close()
+        finally:
+            with fitz_lock:
+                pdf_document.close()
+    else:
+        job["metadata"] = client._extract_metadata(document_path)
+
+    logger.info(f"Rasterized {page_count} pages of {document_path}; fanning out analysis")
+    return self.replace(chord(
+        [analyze_page.si(job, page_index) for page_index in range(page_count)],
+        aggregate_analysis.s(job)
+    ))
+
+
+@celery_app.task(name="pipeline.analyze_page")
+def analyze_page(job: Dict[str, Any], page_index: int) -> Dict[str, Any]:
+    """Analyze one page from its stored render"""
+    client = get_worker_client()
+    image = None
+    image_path = _page_image_path(job, page_index)
+    if os.path.exists(image_path):
+        with Image.open(image_path) as stored:
+            image = stored.convert("RGB")
+
+    raster, native_text = client.load_page(job["document_path"], page_index, job["features"], image)
+    page_data, cache_hit = client.analyze_single_page(raster, native_text, page_index + 1, job["features"])
+    # Round-trip NumPy values into plain JSON for the result backend
+    page_data = json.loads(json.dumps(page_data, default=_json_default))
+    page_data["_cache_hit"] = cache_hit
+    return page_data
+
+
+@celery_app.task(name="pipeline.aggregate_analysis")
+def aggregate_analysis(pages: List[Dict[str, Any]], job: Dict[str, Any]) -> Dict[str, Any]:
+    """Chord callback: combine page results into the document analysis"""
+    client = get_worker_client()
+    cache_hits = [page.pop("_cache_hit", False) for page in pages]
+    metadata = job["metadata"]
+    metadata["analysis_cache"] = {
+        "document_hit": False,
+        "page_hits": sum(cache_hits),
+        "page_misses": len(cache_hits) - sum(cache_hits)
+    }
+    layout_data = client._assemble_layout_data(metadata, pages)
+
+    if job.get("cache_key") and client.cache is not None:
+        client.cache.set_sync(job["cache_key"], layout_data)
+
+    job = {key: value for key, value in job.items() if key not in ("metadata", "cache_key")}
+    return _store_analysis(job, layout_data)
+
+
+@celery_app.task(name="pipeline.score_document")
+def score_document(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Score the analyzed document against its template(s)"""
+    from app.services.template_service import TemplateService
+
+    layout_data = ResultStore().load(job["result_key"])
+
+    # Templates can be added by the API at any time, so the index is loaded per job
+    service = TemplateService(document_client=get_worker_client())
+    scores = asyncio.run(service.match_document(
+        job["document_path"],
+        layout_data,
+        template_ids=[job["template_id"]] if job.get("template_id") else None,
+        content_hash=job["content_hash"]
+    ))
+    return {**job, "scores": [score.to_dict() for score in scores]}
+
+
+@celery_app.task(name="pipeline.certify_document")
+def certify_document(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Record the validation outcome and certify documents that passed"""
+    best = job["scores"][0] if job["scores"] else None
+    result = {
+        "job_id": job["job_id"],
+        "document_path": job["document_path"],
+        "result_key": job["result_key"],
+        "passed": bool(best and best["passed"]),
+        "template_id": best["template_id"] if best else None,
+        "score": best["score"] if best else None,
+        "certificate_key": None,
+        "scores": job["scores"]
+    }
+
+    if result["passed"]:
+        certificate = {
+            "job_id": job["job_id"],
+            "document": os.path.basename(job["document_path"]),
+            "content_hash": job["content_hash"],
+            "template_id": result["template_id"],
+            "score": result["score"],
+            "threshold": best["threshold"],
+            "certified_at": datetime.now(timezone.utc).isoformat()
+        }
+        result["certificate_key"] = f"{job['job_id']}.json"
+        get_storage().put_bytes("certified", result["certificate_key"], json.dumps(certificate, indent=2).encode())
+
+    shutil.rmtree(_job_dir(job), ignore_errors=True)
+    # The analysis stays readable under result_key for the retention period
+    if settings.ANALYSIS_RESULTS_RETENTION > 0:
+        ResultStore().purge(settings.ANALYSIS_RESULTS_RETENTION)
+    logger.info(f"Validation {job['job_id']} {'passed' if result['passed'] else 'failed'}")
+    return result
+
+
+@celery_app.task(name="pipeline.cleanup_job")
+def cleanup_job(job: Dict[str, Any]):
+    """Error callback: remove a failed job's page renders and stored analysis"""
+    shutil.rmtree(_job_dir(job), ignore_errors=True)
+    ResultStore().delete(job["job_id"])
@@ -0,0 +1,121 @@
+"""
+Micro-batching front end for the LayoutParser model
+Pages submitted by concurrent callers are collected for up to a short wait
+and run through the model as one batch, so CPU inference threads work on
+several pages at once instead of one
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Tuple
+
+from PIL import Image
+
+from app.config import settings
+from app.core.model_registry import get_layout_model
+
+logger = logging.getLogger(__name__)
+
+_batchers: Dict[Tuple[str, float], "LayoutBatcher"] = {}
+_batchers_lock = threading.Lock()
+
+
+def _supports_batching(model) -> bool:
+    """EfficientDet models expose the pieces needed to run a stacked batch"""
+    return (
+        hasattr(model, "preprocessor") and hasattr(model.preprocessor, "preprocess")
+        and all(hasattr(model, attr) for attr in ("model", "image_loader", "gather_output", "device"))
+    )
+
+
+def detect_batch(model, images: List[Image.Image]) -> List[Any]:
+    """Run layout detection on several pages, batched when the model allows it"""
+    if len(images) == 1 or not _supports_batching(model):
+        return [model.detect(image) for image in images]
+
+    import torch
+
+    # Same steps as EfficientDetLayoutModel.detect, with the inputs stacked;
+    # every input is resized to the model's fixed size so they concatenate
+    inputs, infos = zip(*(model.preprocessor.preprocess(model.image_loader(image)) for image in images))
+    batch = torch.cat(inputs).to(model.device)
+    image_info = {key: torch.cat([info[key] for info in infos]).to(model.device) for key in infos[0]}
+
+    with torch.no_grad():
+        outputs = model.model(batch, image_info)
+
+    return [model.gather_output(outputs[i:i + 1]) for i in range(len(images))]
+
+
+class LayoutBatcher:
+    """Collects detect() calls from many threads into model batches"""
+
+    def __init__(self, model, max_batch_size: int, max_wait_ms: float):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[Image.Image, Future]]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def detect(self, image: Image.Image):
+        """Detect layout for one page; blocks until its batch has run"""
+        if self.max_batch_size <= 1:
+            return self.model.detect(image)
+
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((image, future))
+        return future.result()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="layout-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: List[Tuple[Image.Image, Future]]):
+        images = [image for image, _ in batch]
+        try:
+            layouts = detect_batch(self.model, images)
+        except Exception as e:
+            logger.error(f"Layout detection failed for a batch of {len(batch)} pages: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        logger.debug(f"Ran layout detection on a batch of {len(batch)} pages")
+        for (_, future), layout in zip(batch, layouts):
+            future.set_result(layout)
+
+
+def get_layout_batcher(model_id: str, confidence_threshold: float) -> LayoutBatcher:
+    """Return the process-wide batcher for a layout model"""
+    key = (model_id, confidence_threshold)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = LayoutBatcher(
+                get_layout_model(model_id, confidence_threshold),
+                max_batch_size=settings.LAYOUT_BATCH_SIZE,
+                max_wait_ms=settings.LAYOUT_BATCH_MAX_WAIT_MS
+            )
+            _batchers[key] = batcher
+        return batcher
@@ -0,0 +1,72 @@
+"""
+Process-wide registry for heavy document analysis models
+Loads the LayoutParser model and probes Tesseract lazily, once per process,
+and shares them across every OpenSourceDocumentClient instance (OCR engines
+are shared the same way through app.core.ocr_engines)
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LAYOUT_CONFIDENCE = 0.5
+
+_layout_models: Dict[Tuple[str, float], Any] = {}
+_layout_lock = threading.Lock()
+
+_tesseract_version: Optional[str] = None
+_tesseract_lock = threading.Lock()
+
+
+def get_layout_model(model_id: str, confidence_threshold: float = DEFAULT_LAYOUT_CONFIDENCE):
+    """Return the shared LayoutParser model, loading it on first use"""
+    key = (model_id, confidence_threshold)
+    model = _layout_models.get(key)
+    if model is not None:
+        return model
+
+    with _layout_lock:
+        model = _layout_models.get(key)
+        if model is None:
+            # Deferred: importing layoutparser pulls in torch
+            import layoutparser as lp
+
+            logger.info(f"Loading layout model {model_id}")
+            model = lp.AutoLayoutModel(
+                model_id,
+                extra_config={'confidence_threshold': confidence_threshold}
+            )
+            _layout_models[key] = model
+        return model
+
+
+def ensure_tesseract() -> str:
+    """Check once per process that Tesseract is installed and return its version"""
+    global _tesseract_version
+    if _tesseract_version is not None:
+        return _tesseract_version
+
+    with _tesseract_lock:
+        if _tesseract_version is None:
+            import pytesseract
+
+            try:
+                _tesseract_version = str(pytesseract.get_tesseract_version())
+            except Exception as e:
+                logger.error(f"Tesseract not found: {e}")
+                raise RuntimeError("Tesseract OCR must be installed. Run: sudo apt-get install tesseract-ocr")
+        return _tesseract_version
+
+
+def preload_models(layout: bool = True, ocr: bool = True):
+    """Load models up front, e.g. from the FastAPI lifespan or a worker init hook"""
+    if layout:
+        get_layout_model(settings.LAYOUT_MODEL, DEFAULT_LAYOUT_CONFIDENCE)
+    if ocr:
+        from app.core.ocr_engines import get_ocr_engine
+
+        get_ocr_engine(settings.OCR_ENGINE).preload()
@@ -0,0 +1,267 @@
+"""
+OCR engine backends for document analysis
+Every engine takes a NumPy page image and returns a WordTable; long-lived
+engines keep their recognizer loaded so pages are not round-tripped through
+temp files and fresh tesseract processes
+"""
+
+import logging
+import re
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.core.model_registry import ensure_tesseract
+from app.core.word_table import WordTable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TESSERACT_CONFIG = '--oem 3 --psm 6 -l eng'
+
+# Supported OCR_ENGINE values; "tesseract" is the pytesseract CLI wrapper and
+# "tesserocr" the in-process API, which must be installed separately
+OCR_ENGINES = ("tesseract", "tesserocr", "easyocr")
+
+# Tesseract language codes mapped to EasyOCR's
+EASYOCR_LANGUAGES = {"eng": "en", "ara": "ar", "fra": "fr", "deu": "de", "spa": "es"}
+
+_engines: Dict[Tuple[str, str], "OCREngine"] = {}
+_engines_lock = threading.Lock()
+
+
+def parse_tesseract_config(config: str) -> Tuple[List[str], int, int]:
+    """Extract (languages, psm, oem) from a tesseract command-line config"""
+    lang = re.search(r"-l\s+(\S+)", config)
+    psm = re.search(r"--psm\s+(\d+)", config)
+    oem = re.search(r"--oem\s+(\d+)", config)
+    return (
+        lang.group(1).split("+") if lang else ["eng"],
+        int(psm.group(1)) if psm else 3,
+        int(oem.group(1)) if oem else 3
+    )
+
+
+class OCREngine(ABC):
+    """Base class for OCR backends"""
+    name = "base"
+
+    @abstractmethod
+    def recognize(self, image_np: np.ndarray) -> WordTable:
+        """Return the words found in an RGB or grayscale page image"""
+
+    def preload(self):
+        """Load the recognizer ahead of the first page"""
+
+    def shutdown(self):
+        """Release the recognizer's native resources"""
+
+
+class TesseractCLIEngine(OCREngine):
+    """Tesseract through pytesseract; spawns a tesseract process per call"""
+    name = "tesseract"
+
+    def __init__(self, tesseract_config: str = DEFAULT_TESSERACT_CONFIG):
+        self.tesseract_config = tesseract_config
+
+    def preload(self):
+        ensure_tesseract()
+
+    def recognize(self, image_np: np.ndarray) -> WordTable:
+        import pytesseract
+
+        ensure_tesseract()
+
+        # Get detailed OCR data
+        ocr_data = pytesseract.image_to_data(
+            image_np,
+            output_type=pytesseract.Output.DICT,
+            config=self.tesseract_config
+        )
+
+        # Keep the columnar layout Tesseract returns, dropping empty boxes
+        keep = [i for i, text in enumerate(ocr_data['text']) if text.strip()]
+
+        return WordTable(
+            text=[ocr_data['text'][i] for i in keep],
+            x=np.asarray(ocr_data['left'], dtype=np.int32)[keep],
+            y=np.asarray(ocr_data['top'], dtype=np.int32)[keep],
+            width=np.asarray(ocr_data['width'], dtype=np.int32)[keep],
+            height=np.asarray(ocr_data['height'], dtype=np.int32)[keep],
+            confidence=np.asarray(ocr_data['conf'], dtype=np.float64)[keep] / 100.0
+        )
+
+
+class TesserocrEngine(OCREngine):
+    """In-process Tesseract through tesserocr
+
+    Each thread keeps its own long-lived API handle with traineddata loaded;
+    images are passed as raw buffers, with no temp files or subprocesses.
+    A handle is ended when its thread exits or on shutdown().
+    """
+    name = "tesserocr"
+
+    def __init__(self, tesseract_config: str = DEFAULT_TESSERACT_CONFIG):
+        import tesserocr  # noqa: F401 - fail early when not installed
+
+        languages, self.psm, self.oem = parse_tesseract_config(tesseract_config)
+        self.lang = "+".join(languages)
+        self._local = threading.local()
+        self._finalizers: List[weakref.finalize] = []
+        self._finalizers_lock = threading.Lock()
+
+    def _api(self):
+        handle = getattr(self._local, "handle", None)
+        if handle is None:
+            import tesserocr
+
+            handle = _ApiHandle(tesserocr.PyTessBaseAPI(
+                lang=self.lang,
+                psm=self.psm,
+                oem=self.oem
+            ))
+            # Thread-local values are dropped when their thread exits, which
+            # collects the handle and ends its API
+            finalizer = weakref.finalize(handle, handle.api.End)
+            with self._finalizers_lock:
+                self._finalizers = [f for f in self._finalizers if f.alive]
+                self._finalizers.append(finalizer)
+            self._local.handle = handle
+        return handle.api
+
+    def preload(self):
+        self._api()
+
+    def shutdown(self):
+        with self._finalizers_lock:
+            finalizers, self._finalizers = self._finalizers, []
+            self._local = threading.local()
+        for finalizer in finalizers:
+            finalizer()
+
+    def recognize(self, image_np: np.ndarray) -> WordTable:
+        import tesserocr
+
+        image_np = np.ascontiguousarray(image_np)
+        height, width = image_np.shape[:2]
+        channels = 1 if image_np.ndim == 2 else image_np.shape[2]
+
+        api = self._api()
+        api.SetImageBytes(image_np.tobytes(), width, height, channels, width * channels)
+        api.Recognize()
+
+        level = tesserocr.RIL.WORD
+        texts, boxes, confidences = [], [], []
+        iterator = api.GetIterator()
+        if iterator is not None:
+            for word in tesserocr.iterate_level(iterator, level):
+                text = word.GetUTF8Text(level)
+                if not text or not text.strip():
+                    continue
+                bbox = word.BoundingBox(level)
+                if bbox is None:
+                    continue
+                texts.append(text)
+                boxes.append(bbox)
+                confidences.append(word.Confidence(level))
+        api.Clear()
+
+        boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        return WordTable(
+            text=texts,
+            x=boxes[:, 0],
+            y=boxes[:, 1],
+            width=boxes[:, 2] - boxes[:, 0],
+            height=boxes[:, 3] - boxes[:, 1],
+            confidence=np.asarray(confidences, dtype=np.float64) / 100.0
+        )
+
+
+class _ApiHandle:
+    """Per-thread owner of a tesserocr API, so its lifetime can be tracked"""
+
+    def __init__(self, api):
+        self.api = api
+
+
+class EasyOCREngine(OCREngine):
+    """EasyOCR reader shared by all threads; returns phrase-level boxes
+
+    Reads the OCR_LANGUAGES (tesseract codes, mapped to EasyOCR's).
+    """
+    name = "easyocr"
+
+    def __init__(self, languages: Optional[List[str]] = None):
+        self.languages = [EASYOCR_LANGUAGES.get(lang, lang) for lang in (languages or settings.OCR_LANGUAGES)]
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def preload(self):
+        self._get_reader()
+
+    def _get_reader(self):
+        if self._reader is None:
+            import easyocr
+
+            logger.info(f"Loading EasyOCR reader for {self.languages}")
+            self._reader = easyocr.Reader(self.languages, gpu=False, verbose=False)
+        return self._reader
+
+    def recognize(self, image_np: np.ndarray) -> WordTable:
+        import cv2
+
+        # EasyOCR reads 3-channel arrays as BGR; pages are RGB
+        if image_np.ndim == 3 and image_np.shape[2] == 3:
+            image_np = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
+        with self._lock:
+            results = self._get_reader().readtext(image_np)
+
+        texts, boxes, confidences = [], [], []
+        for corners, text, confidence in results:
+            if not text.strip():
+                continue
+            corners = np.asarray(corners, dtype=np.float64)
+            x0, y0 = corners.min(axis=0)
+            x1, y1 = corners.max(axis=0)
+            texts.append(text)
+            boxes.append((x0, y0, x1 - x0, y1 - y0))
+            confidences.append(confidence)
+
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        return WordTable.from_columns(texts, boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3], confidences)
+
+
+def _create_engine(name: str, tesseract_config: str) -> OCREngine:
+    if name == "tesseract":
+        return TesseractCLIEngine(tesseract_config)
+    if name == "tesserocr":
+        return TesserocrEngine(tesseract_config)
+    if name == "easyocr":
+        return EasyOCREngine()
+    raise ValueError(f"Unsupported OCR engine '{name}'. Options: {', '.join(OCR_ENGINES)}")
+
+
+def get_ocr_engine(name: str, tesseract_config: str = DEFAULT_TESSERACT_CONFIG) -> OCREngine:
+    """Return the process-wide OCR engine for an OCR_ENGINE value"""
+    key = (name, tesseract_config)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _create_engine(name, tesseract_config)
+            _engines[key] = engine
+        return engine
+
+
+def shutdown_ocr_engines():
+    """Release every OCR engine created by this process"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.shutdown()
+        _engines.clear()
@@ -3,24 +3,72 @@ Open-source alternative to Azure Document Intelligence
 Uses Tesseract OCR, LayoutParser, and other open-source tools
 """
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any, List, Tuple
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Iterator
 import numpy as np
 from PIL import Image
-import cv2
-import pytesseract
-import layoutparser as lp
-from pdf2image import convert_from_path
 import fitz  # PyMuPDF
 from pathlib import Path
 import json
 import os
-from dataclasses import dataclass, asdict
-import torch
-import io
+from dataclasses import dataclass, asdict, field
+
+from app.config import settings
+from app.core.analysis_cache import get_analysis_cache, hash_file, hash_image, make_cache_key
+from app.core.analysis_executor import get_analysis_executor, run_in_thread_loop
+from app.core.exceptions import DocumentComplianceException
+from app.core.layout_batcher import LayoutBatcher, get_layout_batcher
+from app.core.model_registry import DEFAULT_LAYOUT_CONFIDENCE, get_layout_model
+from app.core.ocr_engines import DEFAULT_TESSERACT_CONFIG, OCREngine, get_ocr_engine
+from app.core.page_pipeline import PagePipeline, Stage, plan_stages
+from app.core.page_raster import ImageRaster, PageRaster, PdfPageRaster, fitz_lock
+from app.core.page_scheduler import get_page_scheduler
+from app.core.spatial_index import CENTER, BoxGridIndex
+from app.core.word_table import TextLines, WordTable, group_lines
+
+# Heavy dependencies (cv2, OCR backends, layoutparser/torch, pdf2image, sklearn)
+# are imported inside the methods that need them to keep import time low
 
 logger = logging.getLogger(__name__)
 
+# Supported PDF rasterization engines
+PDF_RENDER_ENGINES = ("pymupdf", "pdf2image")
+
+# Supported text extraction modes:
+#   auto   - use the PDF text layer, OCR only pages/regions without one
+#   native - use the PDF text layer only, never OCR PDF pages
+#   ocr    - always OCR the rendered page
+TEXT_EXTRACTION_MODES = ("auto", "native", "ocr")
+
+# Supported dominant-color modes for style analysis:
+#   sampled - cluster a random subset of at most STYLE_COLOR_PIXEL_BUDGET pixels
+#   full    - cluster every pixel of the page
+STYLE_COLOR_MODES = ("sampled", "full")
+
+# Page result keys produced for each feature, in response order; paragraphs
+# are produced when both "text" and "layout" are requested
+FEATURE_OUTPUTS = {
+    "layout": ("layout_elements",),
+    "text": ("lines", "words"),
+    "tables": ("tables",),
+    "style": ("styles",)
+}
+PAGE_OUTPUT_ORDER = ("layout_elements", "lines", "words", "tables", "styles", "paragraphs")
+
+# Image regions and text blocks smaller than this (in pixels) are not worth OCR'ing
+MIN_OCR_REGION_SIZE = 32
+
+# Scanned pages whose text blocks are more numerous than this, or cover more
+# than this fraction of the page, are OCR'd in one full-page pass instead
+MAX_OCR_REGIONS = 16
+MAX_OCR_REGION_COVERAGE = 0.6
+
+# Embedded images whose text-layer words cover less than this fraction of
+# them (e.g. a scan with only a Bates number or stamp on top) are OCR'd
+MIN_NATIVE_TEXT_COVERAGE = 0.02
+
 
 @dataclass
 class BoundingBox:
@@ -66,63 +114,160 @@ class LayoutElement:
         }
 
 
+@dataclass
+class NativeTextLayer:
+    """Words taken from a PDF text layer, in page pixel coordinates"""
+    words: WordTable
+    # Regions without extractable text (e.g. scanned figures) that still need OCR
+    ocr_regions: List[BoundingBox] = field(default_factory=list)
+
+
 class OpenSourceDocumentClient:
     """Open-source document intelligence client replacing Azure services"""
     
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         self.config = config or {}
         
-        # Initialize LayoutParser model for document layout analysis
-        self.layout_model = lp.AutoLayoutModel(
-            'lp://EfficientDete/PubLayNet',
-            extra_config={'confidence_threshold': 0.5}
-        )
+        # LayoutParser model settings; the model itself is loaded lazily
+        # and shared through the model registry
+        self.layout_model_id = self.config.get("layout_model", settings.LAYOUT_MODEL)
+        self.layout_confidence_threshold = DEFAULT_LAYOUT_CONFIDENCE
         
-        # Configure Tesseract OCR
-        self.tesseract_config = '--oem 3 --psm 6 -l eng'
+        # Configure OCR; the engine is shared process-wide and loaded on first use
+        self.tesseract_config = self.config.get("tesseract_config", DEFAULT_TESSERACT_CONFIG)
+        self.ocr_engine_name = self.config.get("ocr_engine", settings.OCR_ENGINE)
         
-        # Check if Tesseract is installed
-        try:
-            pytesseract.get_tesseract_version()
-        except Exception as e:
-            logger.error(f"Tesseract not found: {e}")
-            raise RuntimeError("Tesseract OCR must be installed. Run: sudo apt-get install tesseract-ocr")
+        # Configure PDF rasterization
+        self.pdf_engine = self.config.get("pdf_engine", settings.PDF_RENDER_ENGINE)
+        self.dpi = self.config.get("dpi", settings.PDF_RENDER_DPI)
+        self.analysis_dpi = self.config.get("analysis_dpi", settings.ANALYSIS_RENDER_DPI)
+        if self.pdf_engine not in PDF_RENDER_ENGINES:
+            raise ValueError(
+                f"Unsupported PDF render engine '{self.pdf_engine}'. "
+                f"Options: {', '.join(PDF_RENDER_ENGINES)}"
+            )
+        
+        # Configure text extraction
+        self.text_mode = self.config.get("text_mode", settings.TEXT_EXTRACTION_MODE)
+        if self.text_mode not in TEXT_EXTRACTION_MODES:
+            raise ValueError(
+                f"Unsupported text extraction mode '{self.text_mode}'. "
+                f"Options: {', '.join(TEXT_EXTRACTION_MODES)}"
+            )
+        
+        # Configure style analysis
+        self.style_color_mode = self.config.get("style_color_mode", settings.STYLE_COLOR_MODE)
+        self.style_color_pixel_budget = self.config.get("style_color_pixel_budget", settings.STYLE_COLOR_PIXEL_BUDGET)
+        if self.style_color_mode not in STYLE_COLOR_MODES:
+            raise ValueError(
+                f"Unsupported style color mode '{self.style_color_mode}'. "
+                f"Options: {', '.join(STYLE_COLOR_MODES)}"
+            )
+        
+        # Configure page-level parallelism (0 analyzes pages in-process)
+        self.page_workers = self.config.get("page_workers", settings.PAGE_WORKERS)
+        
+        # Cache of complete analysis results keyed by file content
+        if self.config.get("cache_enabled", settings.ANALYSIS_CACHE_ENABLED):
+            self.cache = get_analysis_cache()
+        else:
+            self.cache = None
+        
+        # Cache of single-page results so edited resubmissions only redo changed pages
+        if self.config.get("page_cache_enabled", settings.ANALYSIS_PAGE_CACHE_ENABLED):
+            self.page_cache = get_analysis_cache("page")
+        else:
+            self.page_cache = None
+        
+        # Page analysis stage graph, evaluated lazily per page
+        self.page_stages = self._build_page_stages()
+    
+    @property
+    def layout_model(self):
+        """Shared LayoutParser model, loaded on first use"""
+        return get_layout_model(self.layout_model_id, self.layout_confidence_threshold)
+    
+    @property
+    def analysis_scale(self) -> float:
+        """Full-resolution pixels per analysis pixel (1.0 = single resolution)"""
+        if 0 < self.analysis_dpi < self.dpi:
+            return self.dpi / self.analysis_dpi
+        return 1.0
+    
+    @property
+    def layout_batcher(self) -> LayoutBatcher:
+        """Shared batcher that groups concurrent pages into model batches"""
+        return get_layout_batcher(self.layout_model_id, self.layout_confidence_threshold)
+    
+    @property
+    def ocr_engine(self) -> OCREngine:
+        """Shared OCR engine selected by OCR_ENGINE"""
+        return get_ocr_engine(self.ocr_engine_name, self.tesseract_config)
+    
+    def preload(self):
+        """Load the layout model and OCR engine ahead of the first request"""
+        get_layout_model(self.layout_model_id, self.layout_confidence_threshold)
+        self.ocr_engine.preload()
     
     async def analyze_document_layout(
         self, 
         document_path: str,
-        features: Optional[List[str]] = None
+        features: Optional[List[str]] = None,
+        cancel_event: Optional[threading.Event] = None,
+        content_hash: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Analyze document layout using open-source tools"""
+        """Analyze document layout using open-source tools
+        
+        Stops before the next page once cancel_event is set. content_hash is
+        the file's SHA-256 when already known (e.g. from the upload store);
+        otherwise the file is hashed for the cache lookup.
+        """
         try:
             # Default features if not specified
             if features is None:
                 features = ["layout", "text", "tables", "style"]
             
-            # Convert document to images if PDF
-            if document_path.lower().endswith('.pdf'):
-                images = self._pdf_to_images(document_path)
-            else:
-                images = [Image.open(document_path)]
+            # Serve repeat submissions from the cache without rasterizing
+            cache_key = None
+            if self.cache is not None:
+                if content_hash is None:
+                    content_hash = await asyncio.to_thread(hash_file, document_path)
+                cache_key = make_cache_key(content_hash, features, self._engine_signature())
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Analysis cache hit for {document_path}")
+                    cached["document_metadata"]["filename"] = os.path.basename(document_path)
+                    cached["document_metadata"]["analysis_cache"] = {
+                        "document_hit": True,
+                        "page_hits": 0,
+                        "page_misses": 0
+                    }
+                    return cached
             
-            # Process each page
-            layout_data = {
-                "pages": [],
-                "tables": [],
-                "styles": [],
-                "paragraphs": [],
-                "document_metadata": self._extract_metadata(document_path)
+            # One PDF handle serves metadata, rasterization and the text layer
+            pdf_document = None
+            if document_path.lower().endswith('.pdf'):
+                with fitz_lock:
+                    pdf_document = fitz.open(document_path)
+            try:
+                metadata = self._extract_metadata(document_path, pdf_document)
+                page_cache_stats = {"hits": 0, "misses": 0}
+                pages = await self._analyze_pages(
+                    document_path, features, page_cache_stats, pdf_document, cancel_event
+                )
+            finally:
+                if pdf_document is not None:
+                    with fitz_lock:
+                        pdf_document.close()
+            metadata["analysis_cache"] = {
+                "document_hit": False,
+                "page_hits": page_cache_stats["hits"],
+                "page_misses": page_cache_stats["misses"]
             }
+            layout_data = self._assemble_layout_data(metadata, pages)
             
-            for page_num, image in enumerate(images, 1):
-                page_data = await self._analyze_page(image, page_num, features)
-                layout_data["pages"].append(page_data)
-                
-                # Aggregate tables and paragraphs
-                if "tables" in page_data:
-                    layout_data["tables"].extend(page_data["tables"])
-                if "paragraphs" in page_data:
-                    layout_data["paragraphs"].extend(page_data["paragraphs"])
+            if cache_key is not None:
+                await self.cache.set(cache_key, layout_data)
             
             return layout_data
             
@@ -130,77 +275,478 @@ class OpenSourceDocumentClient:
             logger.error(f"Error analyzing document: {str(e)}")
             raise
     
-    async def _analyze_page(self, image: Image.Image, page_num: int, features: List[str]) -> Dict[str, Any]:
-        """Analyze a single page"""
-        # Convert PIL Image to numpy array for processing
-        image_np = np.array(image)
+    def analyze_document_layout_sync(
+        self,
+        document_path: str,
+        features: Optional[List[str]] = None,
+        cancel_event: Optional[threading.Event] = None,
+        content_hash: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Blocking analyze_document_layout, for executor threads
+        
+        Runs the analysis on the calling thread's long-lived event loop;
+        page work goes to the shared page thread pool.
+        """
+        return run_in_thread_loop(self.analyze_document_layout(document_path, features, cancel_event, content_hash))
+    
+    def _assemble_layout_data(self, metadata: Dict[str, Any], pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine page results, in page order, into the document response"""
+        layout_data = {
+            "pages": [],
+            "tables": [],
+            "styles": [],
+            "paragraphs": [],
+            "document_metadata": metadata
+        }
+        
+        for page_data in pages:
+            layout_data["pages"].append(page_data)
+            
+            # Aggregate tables and paragraphs
+            if "tables" in page_data:
+                layout_data["tables"].extend(page_data["tables"])
+            if "paragraphs" in page_data:
+                layout_data["paragraphs"].extend(page_data["paragraphs"])
+        
+        return layout_data
+    
+    def _engine_signature(self) -> Dict[str, Any]:
+        """Engine settings that affect analysis output, used in cache keys"""
+        return {
+            "tesseract_config": self.tesseract_config,
+            "ocr_engine": self.ocr_engine.name,
+            "layout_model": self.layout_model_id,
+            "layout_confidence_threshold": self.layout_confidence_threshold,
+            "pdf_engine": self.pdf_engine,
+            "dpi": self.dpi,
+            "analysis_dpi": self.analysis_dpi,
+            "text_mode": self.text_mode,
+            "style_color_mode": self.style_color_mode,
+            "style_color_pixel_budget": self.style_color_pixel_budget
+        }
+    
+    async def _analyze_pages(
+        self,
+        document_path: str,
+        features: List[str],
+        page_cache_stats: Optional[Dict[str, int]] = None,
+        pdf_document: Optional[fitz.Document] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[Dict[str, Any]]:
+        """Analyze every page, returning results in page order
+        
+        Pages are rasterized as they are scheduled and at most
+        max_in_flight of them are held in memory at once. Page cache
+        hits and misses are counted into page_cache_stats. An open
+        pdf_document is used, and left open, when given. No further pages
+        are scheduled once cancel_event is set.
+        """
+        if page_cache_stats is None:
+            page_cache_stats = {"hits": 0, "misses": 0}
+        
+        if self.page_workers > 0:
+            scheduler = get_page_scheduler(self.page_workers, self.config)
+            max_in_flight = scheduler.max_in_flight
+        else:
+            # Keep enough pages in flight to fill a layout batch
+            scheduler = None
+            max_in_flight = max(1, settings.LAYOUT_BATCH_SIZE)
+        
+        page_results: Dict[int, Dict[str, Any]] = {}
+        in_flight = set()
+        try:
+            pages = self._iter_pages(document_path, pdf_document, extract_text=self._needs_words(features))
+            for page_num, (raster, native_text) in enumerate(pages, 1):
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                
+                if cancel_event is not None and cancel_event.is_set():
+                    raster.close()
+                    raise DocumentComplianceException("Document analysis was cancelled", status_code=503)
+                
+                in_flight.add(asyncio.ensure_future(
+                    self._schedule_page(
+                        scheduler, raster, native_text, page_num, features, page_results, page_cache_stats
+                    )
+                ))
+                del raster, native_text
+            
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            raise
+        
+        return [page_results[page_num] for page_num in sorted(page_results)]
+    
+    async def _schedule_page(
+        self,
+        scheduler,
+        raster: PageRaster,
+        native_text: Optional[NativeTextLayer],
+        page_num: int,
+        features: List[str],
+        page_results: Dict[int, Dict[str, Any]],
+        page_cache_stats: Dict[str, int]
+    ):
+        """Analyze one page in-process or on the worker pool and release its raster
+        
+        Pages whose analysis render matches a cached page are not re-analyzed.
+        """
+        try:
+            cache_key = None
+            if self.page_cache is not None:
+                page_hash = await asyncio.to_thread(hash_image, raster.image)
+                cache_key = make_cache_key(page_hash, features, self._engine_signature())
+                cached = await self.page_cache.get(cache_key)
+                if cached is not None:
+                    cached["page_number"] = page_num
+                    page_results[page_num] = cached
+                    page_cache_stats["hits"] += 1
+                    return
+                page_cache_stats["misses"] += 1
+            
+            if scheduler is not None:
+                page_data = await scheduler.analyze_page(raster, native_text, page_num, features)
+            else:
+                page_data = await self._analyze_page(raster, native_text, page_num, features)
+            self._materialize_page(page_data)
+            
+            if cache_key is not None:
+                await self.page_cache.set(cache_key, page_data)
+            page_results[page_num] = page_data
+        finally:
+            raster.close()
+    
+    def analyze_single_page(
+        self,
+        raster: PageRaster,
+        native_text: Optional[NativeTextLayer],
+        page_num: int,
+        features: List[str]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Analyze one page in the calling thread, e.g. in a pipeline worker
+        
+        Goes through the page cache like _schedule_page. Returns the
+        materialized page result and whether it was a cache hit; the
+        raster is closed.
+        """
+        try:
+            cache_key = None
+            if self.page_cache is not None:
+                cache_key = make_cache_key(hash_image(raster.image), features, self._engine_signature())
+                cached = self.page_cache.get_sync(cache_key)
+                if cached is not None:
+                    cached["page_number"] = page_num
+                    return cached, True
+            
+            page_data = self._materialize_page(self._analyze_page_sync(raster, native_text, page_num, features))
+            if cache_key is not None:
+                self.page_cache.set_sync(cache_key, page_data)
+            return page_data, False
+        finally:
+            raster.close()
+    
+    def _materialize_page(self, page_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert columnar words and lines of a page result into response dicts
+        
+        Each word dict is built once and shared by the words and lines lists.
+        """
+        words = page_data.get("words")
+        if isinstance(words, WordTable):
+            word_dicts = words.to_dicts()
+            lines = page_data.get("lines")
+            if isinstance(lines, TextLines):
+                page_data["lines"] = lines.to_dicts(words, word_dicts)
+            page_data["words"] = word_dicts
+        return page_data
+    
+    async def _analyze_page(
+        self,
+        raster: PageRaster,
+        native_text: Optional[NativeTextLayer],
+        page_num: int,
+        features: List[str]
+    ) -> Dict[str, Any]:
+        """Analyze a single page
+        
+        Runs on a worker thread so pages of concurrent requests reach the
+        layout batcher together.
+        """
+        return await asyncio.to_thread(self._analyze_page_sync, raster, native_text, page_num, features)
+    
+    def _analyze_page_sync(
+        self,
+        raster: PageRaster,
+        native_text: Optional[NativeTextLayer],
+        page_num: int,
+        features: List[str]
+    ) -> Dict[str, Any]:
+        """Analyze a single page (CPU-bound; safe to run in a worker process)
+        
+        Layout, table and style analysis use the raster's analysis render;
+        OCR reads full-resolution regions. Results are in full-resolution pixels.
+        """
+        outputs = self._page_outputs(features)
+        pipeline = PagePipeline(
+            self.page_stages,
+            {"raster": raster, "native_text": native_text},
+            outputs
+        )
         
         page_data = {
             "page_number": page_num,
-            "width": image.width,
-            "height": image.height,
+            "width": raster.width,
+            "height": raster.height,
             "unit": "pixel"
         }
         
-        # Layout analysis
-        if "layout" in features:
-            layout_elements = self._detect_layout(image)
-            page_data["layout_elements"] = [elem.to_dict() for elem in layout_elements]
+        # Words and lines stay columnar until the page result is materialized
+        for output in outputs:
+            page_data[output] = pipeline.get(output)
         
-        # Text extraction with OCR
-        if "text" in features:
-            text_elements = self._extract_text_with_positions(image_np)
-            page_data["lines"] = self._group_text_into_lines(text_elements)
-            page_data["words"] = [elem.to_dict() for elem in text_elements]
+        return page_data
+    
+    def _page_outputs(self, features: List[str]) -> List[str]:
+        """Page result keys to produce for the requested features"""
+        outputs = {output for feature in features for output in FEATURE_OUTPUTS.get(feature, ())}
+        if "text" in features and "layout" in features:
+            outputs.add("paragraphs")
+        return [output for output in PAGE_OUTPUT_ORDER if output in outputs]
+    
+    def _needs_words(self, features: List[str]) -> bool:
+        """Whether some requested output needs words, i.e. the text layer is worth reading"""
+        return "words" in plan_stages(
+            self.page_stages, self._page_outputs(features), available=("raster", "native_text")
+        )
+    
+    def _build_page_stages(self) -> Dict[str, Stage]:
+        """Declare the page analysis stages and the products each one consumes
         
-        # Table detection
-        if "tables" in features:
-            tables = self._detect_tables(image_np, layout_elements if "layout" in features else None)
-            page_data["tables"] = tables
+        Sources: "raster" (PageRaster) and "native_text" (NativeTextLayer or None).
+        """
+        return {
+            # Analysis render as an array, for pixel-level stages
+            "image_np": Stage(lambda raster: np.array(raster.image), ("raster",)),
+            "layout": Stage(lambda raster: self._detect_layout(raster.image, raster.scale), ("raster",)),
+            # Tables reuse these words when the page extracts them, so it is OCR'd once
+            "words": Stage(self._extract_text_with_positions, ("raster", "native_text")),
+            "layout_elements": Stage(lambda layout: [elem.to_dict() for elem in layout], ("layout",)),
+            "lines": Stage(self._group_text_into_lines, ("words",)),
+            # Table regions come from the layout when it is requested, otherwise from CV
+            "tables": Stage(
+                lambda image_np, raster, layout, words: self._detect_tables(image_np, raster, words, layout),
+                ("image_np", "raster"),
+                ("layout", "words")
+            ),
+            # Font sizes come from the words when the page extracts them
+            "styles": Stage(
+                lambda image_np, words: self._analyze_styles(image_np, words if words is not None else WordTable.empty()),
+                ("image_np",),
+                ("words",)
+            ),
+            "paragraphs": Stage(self._extract_paragraphs, ("words", "layout"))
+        }
+    
+    def _iter_pages(
+        self,
+        document_path: str,
+        pdf_document: Optional[fitz.Document] = None,
+        extract_text: bool = True
+    ) -> Iterator[Tuple[PageRaster, Optional[NativeTextLayer]]]:
+        """Yield (page raster, native text layer) pairs, one page at a time
         
-        # Style analysis
-        if "style" in features:
-            styles = self._analyze_styles(image_np, text_elements if "text" in features else [])
-            page_data["styles"] = styles
+        The text layer is None when the page has to be OCR'd, or when
+        extract_text is False. Reads from pdf_document when given, otherwise
+        opens the PDF itself.
+        """
+        if not document_path.lower().endswith('.pdf'):
+            yield ImageRaster(Image.open(document_path), self.analysis_scale), None
+            return
         
-        # Extract paragraphs
-        if "text" in features and "layout" in features:
-            paragraphs = self._extract_paragraphs(text_elements, layout_elements)
-            page_data["paragraphs"] = paragraphs
+        owns_document = pdf_document is None
+        if owns_document:
+            with fitz_lock:
+                pdf_document = fitz.open(document_path)
+        try:
+            rasters = self._iter_pdf_rasters(document_path, pdf_document)
+            for page_index, raster in enumerate(rasters):
+                native_text = None
+                if extract_text and self.text_mode != "ocr":
+                    with fitz_lock:
+                        native_text = self._extract_native_text(pdf_document[page_index], raster.width, raster.height)
+                yield raster, native_text
+        finally:
+            if owns_document:
+                with fitz_lock:
+                    pdf_document.close()
+    
+    def _iter_pdf_rasters(self, pdf_path: str, pdf_document: fitz.Document) -> Iterator[PageRaster]:
+        """Rasterize a PDF lazily for multi-resolution analysis
         
-        return page_data
+        With PyMuPDF only the analysis render is made up front; OCR regions
+        are rendered from the file when needed. pdf2image renders the full
+        page and scales it down.
+        """
+        scale = self.analysis_scale
+        if self.pdf_engine == "pdf2image" or scale == 1:
+            for image in self._iter_pdf_pages(pdf_path, pdf_document):
+                yield ImageRaster(image, scale)
+            return
+        
+        zoom = self.dpi / 72
+        images = self._iter_pdf_pages_pymupdf(pdf_path, pdf_document, dpi=self.analysis_dpi)
+        for page_index, image in enumerate(images):
+            with fitz_lock:
+                full_size = (pdf_document[page_index].rect * fitz.Matrix(zoom, zoom)).irect
+            yield PdfPageRaster(
+                image, pdf_path, page_index, self.dpi, full_size.width, full_size.height, scale,
+                document=pdf_document
+            )
     
-    def _pdf_to_images(self, pdf_path: str) -> List[Image.Image]:
-        """Convert PDF to images for processing"""
+    def render_page(self, pdf_path: str, page_index: int, pdf_document: Optional[fitz.Document] = None) -> Image.Image:
+        """Render the image load_page() builds a page's raster from
+        
+        This is the analysis render when regions are re-rendered from the
+        PDF, otherwise the full-resolution render.
+        """
+        if self.pdf_engine == "pdf2image":
+            from pdf2image import convert_from_path
+            
+            return convert_from_path(
+                pdf_path, dpi=self.dpi, first_page=page_index + 1, last_page=page_index + 1
+            )[0]
+        
+        dpi = self.dpi if self.analysis_scale == 1 else self.analysis_dpi
+        zoom = dpi / 72
+        with fitz_lock:
+            owns_document = pdf_document is None
+            if owns_document:
+                pdf_document = fitz.open(pdf_path)
+            try:
+                pix = pdf_document[page_index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            finally:
+                if owns_document:
+                    pdf_document.close()
+    
+    def load_page(
+        self,
+        document_path: str,
+        page_index: int,
+        features: List[str],
+        image: Optional[Image.Image] = None
+    ) -> Tuple[PageRaster, Optional[NativeTextLayer]]:
+        """Build the raster and text layer of a single page, like _iter_pages
+        
+        image is a render_page() result made earlier, possibly by another
+        process; the page is rendered here when it is not given.
+        """
+        if not document_path.lower().endswith('.pdf'):
+            return ImageRaster(image or Image.open(document_path), self.analysis_scale), None
+        
+        if image is None:
+            image = self.render_page(document_path, page_index)
+        
+        scale = self.analysis_scale
+        with fitz_lock:
+            pdf_document = fitz.open(document_path)
+            try:
+                page = pdf_document[page_index]
+                if self.pdf_engine == "pdf2image" or scale == 1:
+                    raster = ImageRaster(image, scale)
+                else:
+                    zoom = self.dpi / 72
+                    full_size = (page.rect * fitz.Matrix(zoom, zoom)).irect
+                    raster = PdfPageRaster(
+                        image, document_path, page_index, self.dpi, full_size.width, full_size.height, scale
+                    )
+                
+                native_text = None
+                if self._needs_words(features) and self.text_mode != "ocr":
+                    native_text = self._extract_native_text(page, raster.width, raster.height)
+            finally:
+                pdf_document.close()
+        
+        return raster, native_text
+    
+    def _iter_pdf_pages(self, pdf_path: str, pdf_document: Optional[fitz.Document] = None) -> Iterator[Image.Image]:
+        """Rasterize a PDF lazily using the configured render engine"""
+        if self.pdf_engine == "pdf2image":
+            return self._iter_pdf_pages_pdf2image(pdf_path)
+        return self._iter_pdf_pages_pymupdf(pdf_path, pdf_document)
+    
+    def _iter_pdf_pages_pymupdf(
+        self,
+        pdf_path: str,
+        pdf_document: Optional[fitz.Document] = None,
+        dpi: Optional[int] = None
+    ) -> Iterator[Image.Image]:
+        """Rasterize PDF pages with PyMuPDF, one page per iteration
+        
+        Renders from pdf_document when given, otherwise opens pdf_path, at
+        dpi (default: the configured render DPI).
+        """
+        zoom = (dpi or self.dpi) / 72
+        matrix = fitz.Matrix(zoom, zoom)
+        
+        owns_document = pdf_document is None
+        if owns_document:
+            with fitz_lock:
+                pdf_document = fitz.open(pdf_path)
         try:
-            # Use pdf2image for conversion
-            images = convert_from_path(pdf_path, dpi=300)
-            return images
-        except Exception as e:
-            logger.error(f"Error converting PDF to images: {e}")
-            # Fallback to PyMuPDF
-            pdf_document = fitz.open(pdf_path)
-            images = []
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
-                pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-                img_data = pix.pil_tobytes(format="PNG")
-                images.append(Image.open(io.BytesIO(img_data)))
-            pdf_document.close()
-            return images
-    
-    def _detect_layout(self, image: Image.Image) -> List[LayoutElement]:
-        """Detect document layout elements"""
-        # Use LayoutParser for layout detection
-        layout = self.layout_model.detect(image)
+            for page_index in range(pdf_document.page_count):
+                with fitz_lock:
+                    pix = pdf_document[page_index].get_pixmap(matrix=matrix, alpha=False)
+                    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+                # Drop the pixmap before handing the page out
+                del pix
+                yield image
+        finally:
+            if owns_document:
+                with fitz_lock:
+                    pdf_document.close()
+    
+    def _iter_pdf_pages_pdf2image(self, pdf_path: str) -> Iterator[Image.Image]:
+        """Rasterize PDF pages with pdf2image (poppler), one page per iteration"""
+        from pdf2image import convert_from_path, pdfinfo_from_path
+        
+        page_count = pdfinfo_from_path(pdf_path)["Pages"]
+        for page_num in range(1, page_count + 1):
+            yield convert_from_path(
+                pdf_path,
+                dpi=self.dpi,
+                first_page=page_num,
+                last_page=page_num
+            )[0]
+    
+    def _pdf_to_images(self, pdf_path: str) -> List[Image.Image]:
+        """Convert PDF to images for processing
+        
+        Holds every page in memory; prefer _iter_pdf_pages for analysis.
+        """
+        return list(self._iter_pdf_pages(pdf_path))
+    
+    def _detect_layout(self, image: Image.Image, scale: float = 1.0) -> List[LayoutElement]:
+        """Detect document layout elements
+        
+        Coordinates are multiplied by scale, mapping an analysis render back
+        to full-resolution pixels.
+        """
+        # Use LayoutParser for layout detection, batched with concurrent pages
+        layout = self.layout_batcher.detect(image)
         
         layout_elements = []
         for element in layout:
+            x0, y0, x1, y1 = (c * scale for c in element.coordinates)
             bbox = BoundingBox(
-                x=element.coordinates[0],
-                y=element.coordinates[1],
-                width=element.coordinates[2] - element.coordinates[0],
-                height=element.coordinates[3] - element.coordinates[1]
+                x=x0,
+                y=y0,
+                width=x1 - x0,
+                height=y1 - y0
             )
             
             layout_elem = LayoutElement(
@@ -212,121 +758,188 @@ class OpenSourceDocumentClient:
         
         return layout_elements
     
-    def _extract_text_with_positions(self, image_np: np.ndarray) -> List[TextElement]:
-        """Extract text with positions using Tesseract OCR"""
-        # Get detailed OCR data
-        ocr_data = pytesseract.image_to_data(
-            image_np, 
-            output_type=pytesseract.Output.DICT,
-            config=self.tesseract_config
-        )
+    def _extract_native_text(self, page: fitz.Page, width: int, height: int) -> Optional[NativeTextLayer]:
+        """Read words from a PDF page's text layer, scaled to the rendered page size
         
-        text_elements = []
-        n_boxes = len(ocr_data['text'])
+        Returns None when the page has no text layer (e.g. a scan) so the
+        whole page is OCR'd instead.
+        """
+        words = page.get_text("words")
+        if not words and self.text_mode == "auto":
+            return None
         
-        for i in range(n_boxes):
-            if ocr_data['text'][i].strip():
-                bbox = BoundingBox(
-                    x=ocr_data['left'][i],
-                    y=ocr_data['top'][i],
-                    width=ocr_data['width'][i],
-                    height=ocr_data['height'][i]
-                )
-                
-                text_elem = TextElement(
-                    text=ocr_data['text'][i],
-                    bounding_box=bbox,
-                    confidence=ocr_data['conf'][i] / 100.0
-                )
-                text_elements.append(text_elem)
+        # Text coordinates are unrotated PDF points; map them onto the rendered image
+        to_pixels = page.rotation_matrix * fitz.Matrix(width / page.rect.width, height / page.rect.height)
         
-        return text_elements
-    
-    def _group_text_into_lines(self, text_elements: List[TextElement]) -> List[Dict[str, Any]]:
-        """Group text elements into lines based on vertical position"""
-        if not text_elements:
-            return []
+        texts = []
+        rects = []
+        for x0, y0, x1, y1, text, *_ in words:
+            texts.append(text)
+            rects.append(fitz.Rect(x0, y0, x1, y1) * to_pixels)
+        word_table = WordTable.from_columns(
+            texts,
+            [r.x0 for r in rects],
+            [r.y0 for r in rects],
+            [r.width for r in rects],
+            [r.height for r in rects],
+            np.ones(len(texts))
+        )
         
-        # Sort by vertical position
-        sorted_elements = sorted(text_elements, key=lambda e: (e.bounding_box.y, e.bounding_box.x))
+        # Embedded images with little or no text on top of them may be scanned content
+        ocr_regions = []
+        if self.text_mode == "auto":
+            word_index = BoxGridIndex.from_boxes(word_table.boxes())
+            word_areas = word_table.width * word_table.height
+            replaced = np.zeros(len(word_table), dtype=bool)
+            for image_info in page.get_image_info():
+                rect = fitz.Rect(image_info["bbox"]) * to_pixels
+                rect &= fitz.Rect(0, 0, width, height)
+                if rect.width < MIN_OCR_REGION_SIZE or rect.height < MIN_OCR_REGION_SIZE:
+                    continue
+                region = BoundingBox(x=rect.x0, y=rect.y0, width=rect.width, height=rect.height)
+                inside = word_index.query(region.x, region.y, region.width, region.height, CENTER)
+                if word_areas[inside].sum() < MIN_NATIVE_TEXT_COVERAGE * rect.width * rect.height:
+                    ocr_regions.append(region)
+                    # OCR reads these words again along with the rest of the image
+                    replaced[inside] = True
+            if replaced.any():
+                word_table = word_table.take(np.flatnonzero(~replaced))
         
-        lines = []
-        current_line = []
-        current_y = sorted_elements[0].bounding_box.y
-        line_threshold = 10  # pixels
+        return NativeTextLayer(words=word_table, ocr_regions=ocr_regions)
+    
+    def _extract_text_with_positions(
+        self,
+        raster: PageRaster,
+        native_text: Optional[NativeTextLayer] = None
+    ) -> WordTable:
+        """Extract text with positions from the PDF text layer or Tesseract OCR
         
-        for elem in sorted_elements:
-            if abs(elem.bounding_box.y - current_y) <= line_threshold:
-                current_line.append(elem)
-            else:
-                if current_line:
-                    lines.append(self._create_line_dict(current_line))
-                current_line = [elem]
-                current_y = elem.bounding_box.y
+        When a native text layer is available only its image regions are OCR'd.
+        Otherwise, with a low-resolution analysis render, only the page's text
+        blocks are rendered at full resolution and OCR'd.
+        """
+        if native_text is not None:
+            tables = [native_text.words]
+            regions = native_text.ocr_regions
+        else:
+            tables = []
+            regions = self._find_text_regions(raster) if raster.scale > 1 else None
+            if regions is None:
+                return self._ocr_words(raster.render_page())
         
-        if current_line:
-            lines.append(self._create_line_dict(current_line))
+        for region in regions:
+            x, y = int(region.x), int(region.y)
+            region_img = raster.render_region(region.x, region.y, region.width, region.height)
+            tables.append(self._ocr_words(region_img).offset(x, y))
         
-        return lines
+        return WordTable.concat(tables)
     
-    def _create_line_dict(self, elements: List[TextElement]) -> Dict[str, Any]:
-        """Create a line dictionary from text elements"""
-        sorted_elems = sorted(elements, key=lambda e: e.bounding_box.x)
+    def _find_text_regions(self, raster: PageRaster) -> Optional[List[BoundingBox]]:
+        """Locate blocks of ink on the analysis render, in full-resolution pixels
         
-        min_x = min(e.bounding_box.x for e in sorted_elems)
-        max_x = max(e.bounding_box.x + e.bounding_box.width for e in sorted_elems)
-        min_y = min(e.bounding_box.y for e in sorted_elems)
-        max_y = max(e.bounding_box.y + e.bounding_box.height for e in sorted_elems)
+        Returns None when OCR'ing the whole page at once is cheaper, i.e. the
+        blocks are too many or cover most of the page.
+        """
+        import cv2
         
-        return {
-            "text": " ".join(e.text for e in sorted_elems),
-            "bounding_box": BoundingBox(
-                x=min_x,
-                y=min_y,
-                width=max_x - min_x,
-                height=max_y - min_y
-            ).to_dict(),
-            "words": [e.to_dict() for e in sorted_elems]
-        }
+        image_np = np.asarray(raster.image.convert("L"))
+        ink = cv2.threshold(image_np, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+        
+        # Merge characters, words and neighbouring lines into blocks (~1/6 inch)
+        reach = max(int(round(self.dpi / raster.scale / 6)), 1)
+        blocks = cv2.dilate(ink, cv2.getStructuringElement(cv2.MORPH_RECT, (reach, reach)))
+        contours, _ = cv2.findContours(blocks, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        regions = []
+        covered = 0
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            rect = fitz.Rect(x, y, x + w, y + h) * raster.scale
+            rect &= fitz.Rect(0, 0, raster.width, raster.height)
+            if rect.width < MIN_OCR_REGION_SIZE or rect.height < MIN_OCR_REGION_SIZE:
+                continue
+            regions.append(BoundingBox(x=rect.x0, y=rect.y0, width=rect.width, height=rect.height))
+            covered += rect.width * rect.height
+        
+        if len(regions) > MAX_OCR_REGIONS or covered > MAX_OCR_REGION_COVERAGE * raster.width * raster.height:
+            return None
+        return regions
+    
+    def _ocr_words(self, image_np: np.ndarray) -> WordTable:
+        """Extract text with positions using the configured OCR engine"""
+        return self.ocr_engine.recognize(image_np)
+    
+    def _group_text_into_lines(self, words: WordTable) -> TextLines:
+        """Group words into lines based on vertical position"""
+        return group_lines(words)
     
-    def _detect_tables(self, image_np: np.ndarray, layout_elements: Optional[List[LayoutElement]] = None) -> List[Dict[str, Any]]:
-        """Detect and extract tables from the document"""
+    def _detect_tables(
+        self,
+        image_np: np.ndarray,
+        raster: PageRaster,
+        words: Optional[WordTable] = None,
+        layout_elements: Optional[List[LayoutElement]] = None
+    ) -> List[Dict[str, Any]]:
+        """Detect and extract tables from the document
+        
+        Cell text comes from the page's already extracted words, clipped to
+        each table region, rather than from a second OCR pass. Without words
+        only the table regions are rendered at full resolution and OCR'd.
+        image_np is the analysis render of raster; words, layout elements and
+        the results are in full-resolution pixels.
+        """
         tables = []
+        scale = raster.scale
         
         # If layout elements are provided, use them to find table regions
         if layout_elements:
-            table_regions = [elem for elem in layout_elements if elem.type == "Table"]
-            
-            for table_region in table_regions:
-                # Extract table region from image
-                bbox = table_region.bounding_box
-                table_img = image_np[
-                    int(bbox.y):int(bbox.y + bbox.height),
-                    int(bbox.x):int(bbox.x + bbox.width)
-                ]
-                
-                # Process table
-                table_data = self._extract_table_structure(table_img)
-                table_data["bounding_box"] = bbox.to_dict()
-                tables.append(table_data)
+            table_regions = []
+            for elem in layout_elements:
+                if elem.type == "Table":
+                    # Extract table region from image
+                    bbox = elem.bounding_box
+                    table_img = image_np[
+                        int(bbox.y / scale):int((bbox.y + bbox.height) / scale),
+                        int(bbox.x / scale):int((bbox.x + bbox.width) / scale)
+                    ]
+                    table_regions.append({"bbox": bbox, "image": table_img})
         else:
             # Use computer vision to detect tables
-            table_regions = self._detect_table_regions_cv(image_np)
-            for region in table_regions:
-                table_data = self._extract_table_structure(region["image"])
-                table_data["bounding_box"] = region["bbox"].to_dict()
-                tables.append(table_data)
+            table_regions = self._detect_table_regions_cv(image_np, scale)
+        
+        if not table_regions:
+            return tables
+        
+        word_index = BoxGridIndex.from_boxes(words.boxes()) if words is not None else None
+        for region in table_regions:
+            bbox = region["bbox"]
+            # Process table in crop coordinates
+            if word_index is None:
+                table_words = self._ocr_words(raster.render_region(bbox.x, bbox.y, bbox.width, bbox.height))
+            else:
+                word_indices = word_index.query(bbox.x, bbox.y, bbox.width, bbox.height, CENTER)
+                table_words = words.take(word_indices).offset(-int(bbox.x), -int(bbox.y))
+            table_data = self._extract_table_structure(region["image"], table_words, scale)
+            table_data["bounding_box"] = bbox.to_dict()
+            tables.append(table_data)
         
         return tables
     
-    def _detect_table_regions_cv(self, image_np: np.ndarray) -> List[Dict[str, Any]]:
-        """Detect table regions using computer vision"""
+    def _detect_table_regions_cv(self, image_np: np.ndarray, scale: float = 1.0) -> List[Dict[str, Any]]:
+        """Detect table regions using computer vision
+        
+        Sizes are tuned for full-resolution pixels and shrunk by scale for an
+        analysis render; returned boxes are in full-resolution pixels.
+        """
+        import cv2
+        
         # Convert to grayscale
         gray = cv2.cvtColor(image_np, cv2.COLOR_RGB2GRAY) if len(image_np.shape) == 3 else image_np
         
         # Detect horizontal and vertical lines
-        horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (40, 1))
-        vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 40))
+        line_length = max(int(round(40 / scale)), 1)
+        horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (line_length, 1))
+        vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, line_length))
         
         horizontal_lines = cv2.morphologyEx(gray, cv2.MORPH_OPEN, horizontal_kernel, iterations=2)
         vertical_lines = cv2.morphologyEx(gray, cv2.MORPH_OPEN, vertical_kernel, iterations=2)
@@ -340,40 +953,126 @@ class OpenSourceDocumentClient:
         table_regions = []
         for contour in contours:
             x, y, w, h = cv2.boundingRect(contour)
-            if w > 100 and h > 50:  # Filter small regions
-                bbox = BoundingBox(x=x, y=y, width=w, height=h)
+            if w * scale > 100 and h * scale > 50:  # Filter small regions
+                bbox = BoundingBox(x=x * scale, y=y * scale, width=w * scale, height=h * scale)
                 table_img = image_np[y:y+h, x:x+w]
                 table_regions.append({"bbox": bbox, "image": table_img})
         
         return table_regions
     
-    def _extract_table_structure(self, table_img: np.ndarray) -> Dict[str, Any]:
-        """Extract table structure and content"""
-        # This is a simplified implementation
-        # In production, you might use more sophisticated table extraction libraries
+    def _extract_table_structure(self, table_img: np.ndarray, words: WordTable, scale: float = 1.0) -> Dict[str, Any]:
+        """Extract table structure and content from the words inside a table
         
-        # Extract text from table region
-        text = pytesseract.image_to_string(table_img, config=self.tesseract_config)
+        Ruling lines, when the table has them, define the cell grid. Otherwise
+        rows follow text lines and cells are split on wide horizontal gaps, and
+        a line with an empty first column continues the cells above it. Cell
+        text is read line by line. Word coordinates are relative to table_img, times scale.
+        """
+        if not len(words):
+            return {"rows": 0, "columns": 0, "cells": [], "raw_text": ""}
         
-        # Simple row detection based on line breaks
-        rows = [row.strip() for row in text.split('\n') if row.strip()]
+        row_rules, col_rules = self._detect_ruling_lines(table_img)
+        row_rules, col_rules = row_rules * scale, col_rules * scale
+        center_x = words.x + words.width / 2
+        center_y = words.y + words.height / 2
         
-        # Simple column detection based on consistent spacing
+        # Text line of every word, so cells that wrap read line by line
+        lines = group_lines(words)
+        line_ids = np.empty(len(words), dtype=np.intp)
+        for line, (start, end) in enumerate(zip(lines.starts[:-1], lines.starts[1:])):
+            line_ids[lines.order[start:end]] = line
+        
+        # Rows: between horizontal rulings, or one per text line
+        row_ids = np.searchsorted(row_rules, center_y) if len(row_rules) else line_ids
+        
+        median_height = float(np.median(words.height))
         cells = []
-        for row in rows:
-            # Split by multiple spaces (simple heuristic)
-            row_cells = [cell.strip() for cell in row.split('  ') if cell.strip()]
-            if row_cells:
+        spans = []
+        for row in np.unique(row_ids):
+            members = np.flatnonzero(row_ids == row)
+            members = members[np.lexsort((words.x[members], line_ids[members]))]
+            
+            if len(col_rules):
+                # Columns: between vertical rulings; keep empty cells for alignment
+                col_ids = np.searchsorted(col_rules, center_x[members])
+                row_cells = [
+                    " ".join(words.text[i] for i in members[col_ids == col].tolist())
+                    for col in range(len(col_rules) + 1)
+                ]
+                # Drop the margins outside the outer rulings when they are empty
+                if not row_cells[0]:
+                    row_cells = row_cells[1:]
+                if row_cells and not row_cells[-1]:
+                    row_cells = row_cells[:-1]
+                row_spans = []
+            else:
+                # Columns: split where the horizontal gap is wider than ~a word space
+                gaps = words.x[members][1:] - (words.x[members] + words.width[members])[:-1]
+                groups = np.split(members, np.flatnonzero(gaps > 1.5 * median_height) + 1)
+                row_cells = [" ".join(words.text[i] for i in group.tolist()) for group in groups]
+                row_spans = [
+                    (float(words.x[group].min()), float((words.x[group] + words.width[group]).max()))
+                    for group in groups
+                ]
+                
+                # A line with an empty first column whose cells all sit under
+                # cells of the previous row continues that row's wrapped cells
+                if cells and spans[-1] and row_spans[0][0] > spans[-1][0][1]:
+                    targets = [
+                        next((k for k, (x0, x1) in enumerate(spans[-1]) if x0 < end and start < x1), None)
+                        for start, end in row_spans
+                    ]
+                    if None not in targets:
+                        for target, text, (start, end) in zip(targets, row_cells, row_spans):
+                            cells[-1][target] = f"{cells[-1][target]} {text}"
+                            x0, x1 = spans[-1][target]
+                            spans[-1][target] = (min(x0, start), max(x1, end))
+                        continue
+            
+            if any(row_cells):
                 cells.append(row_cells)
+                spans.append(row_spans)
+        
+        raw_rows = [" ".join(cell for cell in row if cell) for row in cells]
         
         return {
             "rows": len(cells),
             "columns": max(len(row) for row in cells) if cells else 0,
             "cells": cells,
-            "raw_text": text
+            "raw_text": "\n".join(raw_rows)
         }
     
-    def _analyze_styles(self, image_np: np.ndarray, text_elements: List[TextElement]) -> Dict[str, Any]:
+    def _detect_ruling_lines(self, table_img: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Find horizontal and vertical ruling lines in a table crop
+        
+        Returns the sorted y positions of horizontal rules and x positions of
+        vertical rules, in crop coordinates.
+        """
+        import cv2
+        
+        if table_img.size == 0:
+            return np.empty(0), np.empty(0)
+        
+        gray = cv2.cvtColor(table_img, cv2.COLOR_RGB2GRAY) if len(table_img.shape) == 3 else table_img
+        ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+        height, width = ink.shape
+        
+        # Keep only strokes spanning at least half of the table
+        horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(width // 2, 1), 1))
+        vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(height // 2, 1)))
+        horizontal = cv2.morphologyEx(ink, cv2.MORPH_OPEN, horizontal_kernel)
+        vertical = cv2.morphologyEx(ink, cv2.MORPH_OPEN, vertical_kernel)
+        
+        return self._rule_positions(horizontal.any(axis=1)), self._rule_positions(vertical.any(axis=0))
+    
+    def _rule_positions(self, mask: np.ndarray) -> np.ndarray:
+        """Centers of consecutive runs of True in a 1-D mask"""
+        padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded))
+        starts, ends = edges[::2], edges[1::2]
+        return (starts + ends - 1) / 2
+    
+    def _analyze_styles(self, image_np: np.ndarray, words: WordTable) -> Dict[str, Any]:
         """Analyze text styles and formatting"""
         styles = {
             "fonts": [],
@@ -386,25 +1085,12 @@ class OpenSourceDocumentClient:
         
         # Detect dominant colors
         if len(image_np.shape) == 3:
-            # Convert to RGB if needed
-            rgb_img = cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB) if image_np.shape[2] == 3 else image_np
-            
-            # Get dominant colors using k-means clustering
-            pixels = rgb_img.reshape(-1, 3)
-            from sklearn.cluster import KMeans
-            
-            n_colors = 5
-            kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=10)
-            kmeans.fit(pixels)
-            
-            colors = kmeans.cluster_centers_.astype(int)
+            colors = self._dominant_colors(image_np)
             styles["colors"] = [{"r": int(c[0]), "g": int(c[1]), "b": int(c[2])} for c in colors]
         
         # Estimate font sizes based on bounding box heights
-        if text_elements:
-            heights = [elem.bounding_box.height for elem in text_elements]
-            unique_heights = list(set(heights))
-            unique_heights.sort()
+        if len(words):
+            unique_heights = np.unique(words.height).tolist()
             
             # Group similar heights as same font size
             font_sizes = []
@@ -417,26 +1103,51 @@ class OpenSourceDocumentClient:
         
         return styles
     
-    def _extract_paragraphs(self, text_elements: List[TextElement], layout_elements: List[LayoutElement]) -> List[Dict[str, Any]]:
+    def _dominant_colors(self, image_np: np.ndarray, n_colors: int = 5) -> np.ndarray:
+        """Find dominant colors with k-means clustering
+        
+        In "sampled" mode only a fixed-seed random subset of pixels is
+        clustered, which keeps the cost independent of page resolution.
+        """
+        from sklearn.cluster import KMeans
+        
+        pixels = image_np.reshape(-1, image_np.shape[2])
+        if self.style_color_mode == "sampled" and len(pixels) > self.style_color_pixel_budget:
+            rng = np.random.default_rng(42)
+            pixels = pixels[rng.integers(0, len(pixels), self.style_color_pixel_budget)]
+        
+        # Pages are rendered as RGB; drop any alpha channel
+        pixels = pixels[:, :3]
+        
+        kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=10)
+        kmeans.fit(pixels)
+        
+        return kmeans.cluster_centers_.astype(int)
+    
+    def _extract_paragraphs(self, words: WordTable, layout_elements: List[LayoutElement]) -> List[Dict[str, Any]]:
         """Extract paragraphs by combining text elements within layout regions"""
         paragraphs = []
         
         # Find paragraph layout elements
         paragraph_regions = [elem for elem in layout_elements if elem.type in ["Text", "List", "Title"]]
         
-        for region in paragraph_regions:
-            # Find text elements within this region
-            region_text = []
-            for text_elem in text_elements:
-                if self._is_inside(text_elem.bounding_box, region.bounding_box):
-                    region_text.append(text_elem)
-            
-            if region_text:
-                # Sort by position
-                region_text.sort(key=lambda e: (e.bounding_box.y, e.bounding_box.x))
-                
+        if not paragraph_regions or not len(words):
+            return paragraphs
+        
+        # Index words in reading order (top-to-bottom, then left-to-right) so
+        # region queries come back already sorted
+        reading_order = words.reading_order()
+        index = BoxGridIndex.from_boxes(words.boxes()[reading_order])
+        
+        region_boxes = [
+            (r.bounding_box.x, r.bounding_box.y, r.bounding_box.width, r.bounding_box.height)
+            for r in paragraph_regions
+        ]
+        
+        for region, word_indices in zip(paragraph_regions, index.assign(region_boxes)):
+            if word_indices.size:
                 # Combine text
-                paragraph_text = " ".join(elem.text for elem in region_text)
+                paragraph_text = " ".join(words.text[i] for i in reading_order[word_indices].tolist())
                 
                 paragraphs.append({
                     "type": region.type,
@@ -454,8 +1165,8 @@ class OpenSourceDocumentClient:
                 inner.x + inner.width <= outer.x + outer.width and 
                 inner.y + inner.height <= outer.y + outer.height)
     
-    def _extract_metadata(self, document_path: str) -> Dict[str, Any]:
-        """Extract document metadata"""
+    def _extract_metadata(self, document_path: str, pdf_document: Optional[fitz.Document] = None) -> Dict[str, Any]:
+        """Extract document metadata, reading from pdf_document when given"""
         metadata = {
             "filename": os.path.basename(document_path),
             "file_size": os.path.getsize(document_path),
@@ -465,18 +1176,22 @@ class OpenSourceDocumentClient:
         # Extract PDF metadata if applicable
         if document_path.lower().endswith('.pdf'):
             try:
-                pdf_document = fitz.open(document_path)
-                pdf_metadata = pdf_document.metadata
-                metadata.update({
-                    "title": pdf_metadata.get("title", ""),
-                    "author": pdf_metadata.get("author", ""),
-                    "subject": pdf_metadata.get("subject", ""),
-                    "creator": pdf_metadata.get("creator", ""),
-                    "creation_date": str(pdf_metadata.get("creationDate", "")),
-                    "modification_date": str(pdf_metadata.get("modDate", "")),
-                    "pages": len(pdf_document)
-                })
-                pdf_document.close()
+                with fitz_lock:
+                    owns_document = pdf_document is None
+                    if owns_document:
+                        pdf_document = fitz.open(document_path)
+                    pdf_metadata = pdf_document.metadata
+                    metadata.update({
+                        "title": pdf_metadata.get("title", ""),
+                        "author": pdf_metadata.get("author", ""),
+                        "subject": pdf_metadata.get("subject", ""),
+                        "creator": pdf_metadata.get("creator", ""),
+                        "creation_date": str(pdf_metadata.get("creationDate", "")),
+                        "modification_date": str(pdf_metadata.get("modDate", "")),
+                        "pages": len(pdf_document)
+                    })
+                    if owns_document:
+                        pdf_document.close()
             except Exception as e:
                 logger.warning(f"Could not extract PDF metadata: {e}")
         
@@ -489,10 +1204,24 @@ class DocumentAnalysisCompatibilityWrapper:
     
     def __init__(self):
         self.client = OpenSourceDocumentClient()
+        self.executor = get_analysis_executor()
     
-    async def analyze_document_layout(self, document_path: str, features: Optional[List[str]] = None) -> Dict[str, Any]:
-        """Analyze document with Azure-compatible response format"""
-        result = await self.client.analyze_document_layout(document_path, features)
+    async def analyze_document_layout(
+        self,
+        document_path: str,
+        features: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
+        content_hash: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Analyze document with Azure-compatible response format
+        
+        The analysis runs on the bounded analysis executor, so the event
+        loop stays free; timeout defaults to WORKER_TIMEOUT.
+        """
+        result = await self.executor.run(
+            self.client.analyze_document_layout_sync, document_path, features,
+            timeout=timeout, content_hash=content_hash
+        )
         
         # Transform to Azure-compatible format if needed
         # This ensures existing code continues to work
@@ -0,0 +1,61 @@
+"""
+Declarative, lazily evaluated page pipeline
+Each stage names the products it consumes; a page computes only the stages
+its requested outputs depend on, each at most once
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Set, Tuple
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One step of page analysis
+
+    compute is called with the values of `inputs`, then of `optional_inputs`.
+    Optional inputs are used only when the page computes them anyway (for
+    another requested output) and are None otherwise.
+    """
+    compute: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    optional_inputs: Tuple[str, ...] = ()
+
+
+def plan_stages(stages: Dict[str, Stage], outputs: Iterable[str], available: Iterable[str] = ()) -> Set[str]:
+    """Return the stages reachable from the outputs through required inputs
+
+    Names in `available` are sources supplied up front rather than stages.
+    """
+    available = set(available)
+    planned = set()
+    pending = list(outputs)
+    while pending:
+        name = pending.pop()
+        if name in planned or name in available:
+            continue
+        if name not in stages:
+            raise KeyError(f"Unknown page stage '{name}'")
+        planned.add(name)
+        pending.extend(stages[name].inputs)
+    return planned
+
+
+class PagePipeline:
+    """Memoized products of one page, computed on first access"""
+
+    def __init__(self, stages: Dict[str, Stage], sources: Dict[str, Any], outputs: Iterable[str]):
+        self.stages = stages
+        self._values: Dict[str, Any] = dict(sources)
+        self.planned = plan_stages(stages, outputs, available=sources)
+
+    def get(self, name: str) -> Any:
+        """Return a product, computing it and its inputs if needed"""
+        if name not in self._values:
+            stage = self.stages[name]
+            args = [self.get(dependency) for dependency in stage.inputs]
+            args.extend(
+                self.get(dependency) if dependency in self.planned or dependency in self._values else None
+                for dependency in stage.optional_inputs
+            )
+            self._values[name] = stage.compute(*args)
+        return self._values[name]
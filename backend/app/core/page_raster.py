@@ -0,0 +1,126 @@
+"""
+Multi-resolution page rasters
+Layout, table and style analysis run on a low-resolution render of each page;
+OCR re-renders only the regions it reads at full resolution. Sizes and region
+coordinates are always in full-resolution (PDF_RENDER_DPI) pixels
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import fitz
+import numpy as np
+from PIL import Image
+
+# MuPDF is not thread-safe; every render in the process goes through this lock
+fitz_lock = threading.RLock()
+
+
+class PageRaster(ABC):
+    """A page rendered for analysis, with full-resolution regions on demand
+
+    `image` is the analysis render; `scale` is the number of full-resolution
+    pixels per analysis pixel (1.0 when both resolutions are the same).
+    """
+
+    def __init__(self, image: Image.Image, width: int, height: int, scale: float = 1.0):
+        self.image = image
+        self.width = width
+        self.height = height
+        self.scale = scale
+
+    @abstractmethod
+    def render_region(self, x: float, y: float, width: float, height: float) -> np.ndarray:
+        """Return the region as a full-resolution array"""
+
+    def render_page(self) -> np.ndarray:
+        """Return the whole page as a full-resolution array"""
+        return self.render_region(0, 0, self.width, self.height)
+
+    def close(self):
+        self.image.close()
+
+
+class ImageRaster(PageRaster):
+    """Raster backed by a full-resolution image held in memory
+
+    Used for image uploads, pdf2image renders and single-resolution analysis.
+    """
+
+    def __init__(self, full_image: Image.Image, scale: float = 1.0):
+        if scale > 1:
+            size = (max(round(full_image.width / scale), 1), max(round(full_image.height / scale), 1))
+            image = full_image.resize(size, Image.BILINEAR)
+        else:
+            scale = 1.0
+            image = full_image
+        super().__init__(image, full_image.width, full_image.height, scale)
+        self.full_image = full_image
+
+    def render_region(self, x: float, y: float, width: float, height: float) -> np.ndarray:
+        full_np = np.asarray(self.full_image)
+        return full_np[int(y):int(y + height), int(x):int(x + width)]
+
+    def render_page(self) -> np.ndarray:
+        return np.array(self.full_image)
+
+    def close(self):
+        super().close()
+        self.full_image.close()
+
+
+class PdfPageRaster(PageRaster):
+    """Raster that re-renders regions of a PDF page from the file
+
+    Renders through `document` when given (the caller keeps it open and
+    closes it); otherwise the file is opened on first use. Only the path and
+    page number are pickled, so sending a page to a worker process costs the
+    analysis render rather than a full-resolution bitmap.
+    """
+
+    def __init__(
+        self,
+        image: Image.Image,
+        pdf_path: str,
+        page_index: int,
+        dpi: int,
+        width: int,
+        height: int,
+        scale: float,
+        document: Optional[fitz.Document] = None
+    ):
+        super().__init__(image, width, height, scale)
+        self.pdf_path = pdf_path
+        self.page_index = page_index
+        self.dpi = dpi
+        self._document = document
+        self._owns_document = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_document"] = None
+        state["_owns_document"] = False
+        return state
+
+    def render_region(self, x: float, y: float, width: float, height: float) -> np.ndarray:
+        zoom = self.dpi / 72
+        matrix = fitz.Matrix(zoom, zoom)
+
+        # Clip rectangles are in (rotated) page points
+        clip = fitz.Rect(int(x), int(y), int(x + width), int(y + height)) * ~matrix
+        with fitz_lock:
+            if self._document is None:
+                self._document = fitz.open(self.pdf_path)
+                self._owns_document = True
+            pix = self._document[self.page_index].get_pixmap(matrix=matrix, clip=clip, alpha=False)
+            region = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n).copy()
+        return region
+
+    def close(self):
+        super().close()
+        if self._owns_document:
+            with fitz_lock:
+                self._document.close()
+            self._owns_document = False
+        self._document = None
@@ -0,0 +1,149 @@
+"""
+Process-pool page scheduler for document analysis
+Fans CPU-bound page analysis out to worker processes, each holding its own
+warm OpenSourceDocumentClient
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, List, Tuple
+
+from app.core.page_raster import PageRaster
+
+logger = logging.getLogger(__name__)
+
+# Client owned by each worker process, built once by the pool initializer
+_worker_client = None
+
+# Config keys the workers override, so they do not split pools
+WORKER_OVERRIDDEN_KEYS = ("page_workers", "cache_enabled", "page_cache_enabled")
+
+# Schedulers shared by every client in this process, keyed by worker count
+# and worker config, since workers analyze pages with the config they start with
+_schedulers: Dict[Tuple[int, str], "PageScheduler"] = {}
+_schedulers_lock = threading.Lock()
+
+
+def _init_worker(config: Dict[str, Any]):
+    """Create the worker's client and load its models before the first page"""
+    global _worker_client
+    from app.config import settings
+    from app.core.opensource_document_client import OpenSourceDocumentClient
+
+    # Each worker gets one page at a time, so batching would only add
+    # LAYOUT_BATCH_MAX_WAIT_MS of latency to every page
+    settings.LAYOUT_BATCH_SIZE = 1
+
+    # Workers always analyze in-process and leave caching to the parent
+    _worker_client = OpenSourceDocumentClient({
+        **config,
+        "page_workers": 0,
+        "cache_enabled": False,
+        "page_cache_enabled": False
+    })
+    try:
+        _worker_client.preload()
+    except Exception as e:
+        # A worker that dies here breaks the whole pool; models load on first page instead
+        logger.warning(f"Could not preload models in page worker: {e}")
+    logger.info(f"Page worker {multiprocessing.current_process().name} ready")
+
+
+def _analyze_page_in_worker(raster: PageRaster, native_text, page_num: int, features: List[str]) -> Dict[str, Any]:
+    """Analyze a single page inside a worker process"""
+    try:
+        return _worker_client._analyze_page_sync(raster, native_text, page_num, features)
+    finally:
+        raster.close()
+
+
+class PageScheduler:
+    """Schedules per-page analysis on a pool of worker processes"""
+
+    def __init__(self, workers: int, config: Optional[Dict[str, Any]] = None):
+        self.workers = workers
+        self.config = config or {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def max_in_flight(self) -> int:
+        """Pages allowed in flight at once; bounds rasterized pages held in memory"""
+        return self.workers * 2
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start the worker pool on first use"""
+        with self._lock:
+            if self._executor is None:
+                # Spawn rather than fork so torch/OpenMP state is not inherited
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.config,)
+                )
+                logger.info(f"Started page analysis pool with {self.workers} workers")
+            return self._executor
+
+    async def analyze_page(self, raster: PageRaster, native_text, page_num: int, features: List[str]) -> Dict[str, Any]:
+        """Analyze a page on the pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(
+                executor,
+                _analyze_page_in_worker,
+                raster,
+                native_text,
+                page_num,
+                features
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool on the next page
+            self._discard_executor(executor)
+            raise
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool unless another page already replaced it"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        logger.warning(f"Page analysis pool broke; restarting it with {self.workers} workers on next use")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker pool"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+
+def _config_key(config: Optional[Dict[str, Any]]) -> str:
+    relevant = {k: v for k, v in (config or {}).items() if k not in WORKER_OVERRIDDEN_KEYS}
+    return json.dumps(relevant, sort_keys=True, default=str)
+
+
+def get_page_scheduler(workers: int, config: Optional[Dict[str, Any]] = None) -> PageScheduler:
+    """Return the process-wide scheduler for a pool size and client config"""
+    key = (workers, _config_key(config))
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = PageScheduler(workers, config)
+            _schedulers[key] = scheduler
+        return scheduler
+
+
+def shutdown_page_schedulers(wait: bool = True):
+    """Stop every page analysis pool started by this process"""
+    with _schedulers_lock:
+        for scheduler in _schedulers.values():
+            scheduler.shutdown(wait=wait)
+        _schedulers.clear()
@@ -0,0 +1,396 @@
+"""
+Compact binary storage for analysis results
+Each page is stored as one zstd-compressed msgpack chunk in columnar form:
+words as typed coordinate arrays plus a text list, lines as index references
+into the page's words, layout elements as columns. The file starts with an
+index of chunk offsets, so a single page can be read without the others,
+and the nested dict shape of analyze_document_layout() is only rebuilt when
+asked for
+"""
+
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import msgpack
+import numpy as np
+import zstandard
+
+from app.config import settings
+from app.core.word_table import TextLines, WordTable
+
+logger = logging.getLogger(__name__)
+
+# File layout: MAGIC, format version (u16), index length (u32), index, page chunks
+MAGIC = b"DCAR"
+RESULT_FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHI")
+
+RESULT_SUFFIX = ".dcar"
+COMPRESSION_LEVEL = 3
+
+# Keys of the dicts the columnar encoders understand; anything else is stored as-is
+WORD_KEYS = {"text", "bounding_box", "confidence"}
+LINE_KEYS = {"text", "bounding_box", "words"}
+ELEMENT_KEYS = {"type", "bounding_box", "confidence", "text_content"}
+BOX_KEYS = ("x", "y", "width", "height")
+
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+# Document-level lists rebuilt by concatenating the page lists
+AGGREGATED_KEYS = ("tables", "paragraphs")
+
+
+def _msgpack_default(obj: Any) -> Any:
+    """Serialize NumPy scalars and arrays returned by the analysis libraries"""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def _pack(value: Any) -> bytes:
+    return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+
+def _unpack(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def _array(values: np.ndarray) -> Dict[str, Any]:
+    values = np.ascontiguousarray(values)
+    return {"dtype": values.dtype.str, "data": values.tobytes()}
+
+
+def _from_array(packed: Dict[str, Any]) -> np.ndarray:
+    return np.frombuffer(packed["data"], dtype=np.dtype(packed["dtype"]))
+
+
+def _is_box(box: Any) -> bool:
+    return isinstance(box, dict) and box.keys() == set(BOX_KEYS)
+
+
+def _numbers(values: List[Any]) -> Optional[Dict[str, Any]]:
+    """Pack a numeric column in a dtype that loads back as the same Python values
+
+    Integers stay integral; returns None for columns mixing ints and floats
+    (or holding anything else), which are then stored verbatim.
+    """
+    if all(isinstance(v, (int, np.integer)) and not isinstance(v, (bool, np.bool_)) for v in values):
+        if all(INT32_MIN <= v <= INT32_MAX for v in values):
+            return _array(np.array(values, dtype=np.int32))
+        return _array(np.array(values, dtype=np.int64))
+    if all(isinstance(v, (float, np.floating)) for v in values):
+        return _array(np.array(values, dtype=np.float64))
+    return None
+
+
+def _number_columns(columns: Dict[str, List[Any]]) -> Optional[Dict[str, Any]]:
+    packed = {key: _numbers(values) for key, values in columns.items()}
+    return None if any(value is None for value in packed.values()) else packed
+
+
+def _box_columns(items: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    return {key: [item["bounding_box"][key] for item in items] for key in BOX_KEYS}
+
+
+def _encode_words(words: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not all(isinstance(w, dict) and w.keys() == WORD_KEYS and _is_box(w["bounding_box"]) for w in words):
+        return None
+    numbers = _number_columns({"confidence": [w["confidence"] for w in words], **_box_columns(words)})
+    if numbers is None:
+        return None
+    return {"text": [w["text"] for w in words], **numbers}
+
+
+def _decode_words(columns: Dict[str, Any]) -> WordTable:
+    # Columns keep their stored dtypes, so integer coordinates stay ints
+    return WordTable(
+        text=list(columns["text"]),
+        confidence=_from_array(columns["confidence"]),
+        **{key: _from_array(columns[key]) for key in BOX_KEYS}
+    )
+
+
+def _word_key(word: Dict[str, Any]) -> tuple:
+    box = word["bounding_box"]
+    return (word["text"], box["x"], box["y"], box["width"], box["height"], word["confidence"])
+
+
+def _encode_lines(lines: List[Dict[str, Any]], words: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Encode lines as word index ranges; None when a line is not made of the page's words"""
+    if not all(isinstance(line, dict) and line.keys() == LINE_KEYS and _is_box(line["bounding_box"]) for line in lines):
+        return None
+
+    # Fresh results share word dicts between words and lines; cached ones are copies
+    by_identity = {id(word): i for i, word in enumerate(words)}
+    by_value = {}
+    for i, word in enumerate(words):
+        by_value.setdefault(_word_key(word), i)
+
+    order = []
+    starts = [0]
+    for line in lines:
+        for word in line["words"]:
+            index = by_identity.get(id(word))
+            if index is None:
+                if not isinstance(word, dict) or word.keys() != WORD_KEYS or not _is_box(word["bounding_box"]):
+                    return None
+                index = by_value.get(_word_key(word))
+                if index is None:
+                    return None
+            order.append(index)
+        if line["text"] != " ".join(words[i]["text"] for i in order[starts[-1]:]):
+            return None
+        starts.append(len(order))
+
+    boxes = _number_columns(_box_columns(lines))
+    if boxes is None:
+        return None
+    return {
+        "order": _array(np.array(order, dtype=np.int32)),
+        "starts": _array(np.array(starts, dtype=np.int32)),
+        **boxes
+    }
+
+
+def _decode_lines(columns: Dict[str, Any]) -> TextLines:
+    return TextLines(
+        order=_from_array(columns["order"]).astype(np.intp),
+        starts=_from_array(columns["starts"]).astype(np.intp),
+        **{key: _from_array(columns[key]) for key in BOX_KEYS}
+    )
+
+
+def _encode_elements(elements: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not all(isinstance(e, dict) and e.keys() == ELEMENT_KEYS and _is_box(e["bounding_box"]) for e in elements):
+        return None
+    numbers = _number_columns({"confidence": [e["confidence"] for e in elements], **_box_columns(elements)})
+    if numbers is None:
+        return None
+    return {
+        "type": [e["type"] for e in elements],
+        "text_content": [e["text_content"] for e in elements],
+        **numbers
+    }
+
+
+def _decode_elements(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    boxes = zip(*(_from_array(columns[key]).tolist() for key in BOX_KEYS))
+    return [
+        {
+            "type": element_type,
+            "bounding_box": dict(zip(BOX_KEYS, box)),
+            "confidence": confidence,
+            "text_content": text_content
+        }
+        for element_type, box, confidence, text_content in zip(
+            columns["type"], boxes, _from_array(columns["confidence"]).tolist(), columns["text_content"]
+        )
+    ]
+
+
+def encode_page(page_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Split a page result into columnar parts and everything else, kept verbatim"""
+    columns = {}
+    raw = dict(page_data)
+
+    words = page_data.get("words")
+    if isinstance(words, list):
+        encoded = _encode_words(words)
+        if encoded is not None:
+            columns["words"] = encoded
+            del raw["words"]
+            lines = page_data.get("lines")
+            if isinstance(lines, list):
+                encoded = _encode_lines(lines, words)
+                if encoded is not None:
+                    columns["lines"] = encoded
+                    del raw["lines"]
+
+    elements = page_data.get("layout_elements")
+    if isinstance(elements, list):
+        encoded = _encode_elements(elements)
+        if encoded is not None:
+            columns["layout_elements"] = encoded
+            del raw["layout_elements"]
+
+    return {"keys": list(page_data), "columns": columns, "raw": raw}
+
+
+class StoredPage:
+    """Columnar view of one stored page"""
+
+    def __init__(self, encoded: Dict[str, Any]):
+        self._keys = encoded["keys"]
+        self._columns = encoded["columns"]
+        self._raw = encoded["raw"]
+
+    @property
+    def words(self) -> Optional[WordTable]:
+        if "words" not in self._columns:
+            return None
+        return _decode_words(self._columns["words"])
+
+    @property
+    def lines(self) -> Optional[TextLines]:
+        if "lines" not in self._columns:
+            return None
+        return _decode_lines(self._columns["lines"])
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """A non-columnar part of the page result (tables, styles, ...)"""
+        return self._raw.get(key, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Rebuild the page in the analyze_document_layout() shape"""
+        values = dict(self._raw)
+        words = self.words
+        if words is not None:
+            word_dicts = words.to_dicts()
+            values["words"] = word_dicts
+            lines = self.lines
+            if lines is not None:
+                values["lines"] = lines.to_dicts(words, word_dicts)
+        if "layout_elements" in self._columns:
+            values["layout_elements"] = _decode_elements(self._columns["layout_elements"])
+        return {key: values[key] for key in self._keys}
+
+
+def encode_result(layout_data: Dict[str, Any], level: int = COMPRESSION_LEVEL) -> bytes:
+    """Serialize an analyze_document_layout() result"""
+    compressor = zstandard.ZstdCompressor(level=level)
+    pages = layout_data.get("pages", [])
+
+    chunks = [compressor.compress(_pack(encode_page(page))) for page in pages]
+    offsets = np.cumsum([0] + [len(chunk) for chunk in chunks]).tolist()
+
+    document = {key: value for key, value in layout_data.items() if key != "pages"}
+    aggregated = []
+    for key in AGGREGATED_KEYS:
+        rebuilt = [item for page in pages for item in page.get(key, [])]
+        if document.get(key) == rebuilt:
+            del document[key]
+            aggregated.append(key)
+
+    index = compressor.compress(_pack({
+        "keys": list(layout_data),
+        "document": document,
+        "aggregated": aggregated,
+        "offsets": offsets
+    }))
+    return b"".join([HEADER.pack(MAGIC, RESULT_FORMAT_VERSION, len(index)), index, *chunks])
+
+
+class StoredResult:
+    """Reader for a stored result that loads pages on demand"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            magic, version, index_length = HEADER.unpack(self._file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"Not an analysis result file: {path}")
+            if version != RESULT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported analysis result format version {version} in {path}")
+            self._decompressor = zstandard.ZstdDecompressor()
+            index = _unpack(self._decompressor.decompress(self._file.read(index_length)))
+        except Exception:
+            self._file.close()
+            raise
+        self._keys = index["keys"]
+        self._document = index["document"]
+        self._aggregated = index["aggregated"]
+        self._offsets = index["offsets"]
+        self._chunks_start = HEADER.size + index_length
+
+    def __enter__(self) -> "StoredResult":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._document.get("document_metadata", {})
+
+    def page(self, index: int) -> StoredPage:
+        """Read and decompress a single page (0-based)"""
+        if not 0 <= index < len(self):
+            raise IndexError(f"Page index {index} out of range for {len(self)} pages")
+        start, end = self._offsets[index], self._offsets[index + 1]
+        self._file.seek(self._chunks_start + start)
+        return StoredPage(_unpack(self._decompressor.decompress(self._file.read(end - start))))
+
+    def iter_pages(self) -> Iterator[StoredPage]:
+        for index in range(len(self)):
+            yield self.page(index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Rebuild the full analyze_document_layout() result"""
+        pages = [page.to_dict() for page in self.iter_pages()]
+        values = {**self._document, "pages": pages}
+        for key in self._aggregated:
+            values[key] = [item for page in pages for item in page.get(key, [])]
+        return {key: values[key] for key in self._keys}
+
+    def close(self):
+        self._file.close()
+
+
+class ResultStore:
+    """Analysis results kept as RESULT_SUFFIX files under ANALYSIS_RESULTS_PATH"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.ANALYSIS_RESULTS_PATH)
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}{RESULT_SUFFIX}"
+
+    def save(self, key: str, layout_data: Dict[str, Any]) -> Path:
+        """Write a result atomically and return its path"""
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f"{RESULT_SUFFIX}.tmp")
+        tmp_path.write_bytes(encode_result(layout_data))
+        os.replace(tmp_path, path)
+        return path
+
+    def open(self, key: str) -> StoredResult:
+        """Open a result for lazy, per-page reading"""
+        return StoredResult(str(self.path(key)))
+
+    def load(self, key: str) -> Dict[str, Any]:
+        """Read a whole result back in the analyze_document_layout() shape"""
+        with self.open(key) as result:
+            return result.to_dict()
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def delete(self, key: str):
+        self.path(key).unlink(missing_ok=True)
+
+    def purge(self, max_age: float) -> int:
+        """Delete results last written more than max_age seconds ago; returns how many"""
+        if not self.root.is_dir():
+            return 0
+        cutoff = time.time() - max_age
+        removed = 0
+        for path in self.root.rglob(f"*{RESULT_SUFFIX}"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                # Removed concurrently by another worker
+                continue
+        if removed:
+            logger.info(f"Purged {removed} analysis results older than {max_age}s")
+        return removed
@@ -0,0 +1,150 @@
+"""
+Grid-based spatial index over axis-aligned boxes
+Used to assign OCR word boxes to layout regions (paragraphs, tables) without
+testing every word against every region
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Query modes
+CONTAINED = "contained"  # box lies entirely within the region
+CENTER = "center"        # box center lies within the region
+
+
+class BoxGridIndex:
+    """Uniform grid over boxes, bucketed by box center
+
+    Boxes are referred to by their position in the arrays passed in, and
+    query results come back in ascending index order, so indexing boxes
+    that are already in reading order yields reading-ordered results.
+    """
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        width: np.ndarray,
+        height: np.ndarray,
+        cell_size: Optional[float] = None
+    ):
+        self.x0 = np.asarray(x, dtype=np.float64)
+        self.y0 = np.asarray(y, dtype=np.float64)
+        self.x1 = self.x0 + np.asarray(width, dtype=np.float64)
+        self.y1 = self.y0 + np.asarray(height, dtype=np.float64)
+        self.size = len(self.x0)
+
+        if self.size == 0:
+            self.cell_size = 1.0
+            self._cols = self._rows = 1
+            self._order = np.empty(0, dtype=np.intp)
+            self._starts = np.zeros(2, dtype=np.intp)
+            return
+
+        # Cells a few words high keep buckets small on dense pages
+        if cell_size is None:
+            cell_size = max(16.0, 4.0 * float(np.median(self.y1 - self.y0)))
+        self.cell_size = cell_size
+
+        cx = (self.x0 + self.x1) / 2
+        cy = (self.y0 + self.y1) / 2
+        self._origin_x = float(cx.min())
+        self._origin_y = float(cy.min())
+        col = ((cx - self._origin_x) // cell_size).astype(np.intp)
+        row = ((cy - self._origin_y) // cell_size).astype(np.intp)
+        self._cols = int(col.max()) + 1
+        self._rows = int(row.max()) + 1
+
+        # Sort boxes by cell so each cell is a contiguous run of _order
+        cell_ids = row * self._cols + col
+        self._order = np.argsort(cell_ids, kind="stable")
+        self._starts = np.searchsorted(
+            cell_ids[self._order], np.arange(self._rows * self._cols + 1)
+        )
+
+    @classmethod
+    def from_boxes(cls, boxes: Sequence[Tuple[float, float, float, float]], cell_size: Optional[float] = None) -> "BoxGridIndex":
+        """Build an index from (x, y, width, height) tuples"""
+        arr = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        return cls(arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3], cell_size)
+
+    def _candidates(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Indices of boxes whose center cell overlaps the query rectangle"""
+        c0 = max(int((x0 - self._origin_x) // self.cell_size), 0)
+        c1 = min(int((x1 - self._origin_x) // self.cell_size), self._cols - 1)
+        r0 = max(int((y0 - self._origin_y) // self.cell_size), 0)
+        r1 = min(int((y1 - self._origin_y) // self.cell_size), self._rows - 1)
+        if c0 > c1 or r0 > r1:
+            return np.empty(0, dtype=np.intp)
+
+        # Within one grid row the cells c0..c1 are a single contiguous run
+        runs = [
+            self._order[self._starts[r * self._cols + c0]:self._starts[r * self._cols + c1 + 1]]
+            for r in range(r0, r1 + 1)
+        ]
+        return np.concatenate(runs)
+
+    def query(self, x: float, y: float, width: float, height: float, mode: str = CONTAINED) -> np.ndarray:
+        """Return indices of boxes in the region, in ascending order"""
+        if self.size == 0:
+            return np.empty(0, dtype=np.intp)
+
+        x1 = x + width
+        y1 = y + height
+        candidates = self._candidates(x, y, x1, y1)
+        if candidates.size == 0:
+            return candidates
+
+        if mode == CONTAINED:
+            mask = (
+                (self.x0[candidates] >= x) & (self.y0[candidates] >= y) &
+                (self.x1[candidates] <= x1) & (self.y1[candidates] <= y1)
+            )
+        elif mode == CENTER:
+            cx = (self.x0[candidates] + self.x1[candidates]) / 2
+            cy = (self.y0[candidates] + self.y1[candidates]) / 2
+            mask = (cx >= x) & (cx <= x1) & (cy >= y) & (cy <= y1)
+        else:
+            raise ValueError(f"Unknown query mode '{mode}'")
+
+        return np.sort(candidates[mask])
+
+    def assign(self, regions: Sequence[Tuple[float, float, float, float]], mode: str = CONTAINED) -> List[np.ndarray]:
+        """Return the indices of boxes inside each (x, y, width, height) region
+
+        Each region only collects the boxes bucketed in the grid cells it
+        overlaps; the containment test then runs once over all regions'
+        candidates together.
+        """
+        regions = np.asarray(regions, dtype=np.float64).reshape(-1, 4)
+        if self.size == 0 or len(regions) == 0:
+            return [np.empty(0, dtype=np.intp) for _ in range(len(regions))]
+        if mode not in (CONTAINED, CENTER):
+            raise ValueError(f"Unknown query mode '{mode}'")
+
+        rx0, ry0 = regions[:, 0], regions[:, 1]
+        rx1, ry1 = rx0 + regions[:, 2], ry0 + regions[:, 3]
+        candidates = [
+            self._candidates(x0, y0, x1, y1)
+            for x0, y0, x1, y1 in zip(rx0.tolist(), ry0.tolist(), rx1.tolist(), ry1.tolist())
+        ]
+        counts = np.array([len(c) for c in candidates], dtype=np.intp)
+        boxes = np.concatenate(candidates) if counts.sum() else np.empty(0, dtype=np.intp)
+        owner = np.repeat(np.arange(len(regions)), counts)
+
+        if mode == CONTAINED:
+            mask = (
+                (self.x0[boxes] >= rx0[owner]) & (self.y0[boxes] >= ry0[owner]) &
+                (self.x1[boxes] <= rx1[owner]) & (self.y1[boxes] <= ry1[owner])
+            )
+        else:
+            cx = (self.x0[boxes] + self.x1[boxes]) / 2
+            cy = (self.y0[boxes] + self.y1[boxes]) / 2
+            mask = (cx >= rx0[owner]) & (cx <= rx1[owner]) & (cy >= ry0[owner]) & (cy <= ry1[owner])
+
+        # Group by region, ascending box index within each
+        boxes, owner = boxes[mask], owner[mask]
+        order = np.lexsort((boxes, owner))
+        splits = np.searchsorted(owner[order], np.arange(1, len(regions)))
+        return np.split(boxes[order], splits)
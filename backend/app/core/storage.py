@@ -0,0 +1,356 @@
+"""
+Pluggable file storage for the paths in Settings
+Files live in named areas (templates, documents, certified, reports,
+visualizations) under keys such as "ab/cd/<hash>.pdf". STORAGE_TYPE selects
+local directories or an S3-compatible bucket; both serve downloads without
+passing file contents through Python where the deployment allows it
+(nginx X-Accel-Redirect locally, presigned URLs for S3)
+"""
+
+import logging
+import mimetypes
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path, PurePosixPath
+from typing import List, Optional, Tuple
+
+import aiofiles
+from fastapi import Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+
+from app.config import settings
+from app.core.exceptions import DocumentComplianceException
+
+logger = logging.getLogger(__name__)
+
+# Supported storage backends
+STORAGE_TYPES = ("local", "s3")
+
+# Storage areas and the Settings path each one maps to locally
+STORAGE_AREAS = {
+    "templates": "TEMPLATES_PATH",
+    "documents": "DOCUMENTS_PATH",
+    "certified": "CERTIFIED_PATH",
+    "reports": "REPORTS_PATH",
+    "visualizations": "VISUALIZATIONS_PATH"
+}
+
+# Bytes read per iteration when streaming a byte range
+RANGE_CHUNK_SIZE = 256 * 1024
+
+# Backend shared by the process, created on first use
+_storage: Optional["StorageBackend"] = None
+_storage_lock = threading.Lock()
+
+
+def validate_key(area: str, key: str) -> str:
+    """Check that an area exists and a key stays inside it"""
+    if area not in STORAGE_AREAS:
+        raise DocumentComplianceException(f"Unknown storage area '{area}'", status_code=404)
+    path = PurePosixPath(key)
+    if not key or path.is_absolute() or ".." in path.parts or "\\" in key:
+        raise DocumentComplianceException(f"Invalid storage key '{key}'", status_code=400)
+    return str(path)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range "bytes=" header into inclusive (start, end)
+
+    Returns None for headers this server does not handle (multiple ranges,
+    other units), which are answered with the whole file. Raises a 416
+    DocumentComplianceException for ranges outside the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise DocumentComplianceException(f"Range not satisfiable for {size} bytes", status_code=416)
+    return start, end
+
+
+class StorageBackend(ABC):
+    """Interface shared by the storage backends"""
+
+    name = ""
+
+    @abstractmethod
+    def put_file(self, area: str, key: str, source_path: str):
+        """Store a local file under key (the source is left in place)"""
+
+    @abstractmethod
+    def put_bytes(self, area: str, key: str, data: bytes):
+        """Store data under key"""
+
+    @abstractmethod
+    def get_bytes(self, area: str, key: str) -> bytes:
+        """Read a stored file; raises FileNotFoundError when it is missing"""
+
+    @abstractmethod
+    def list_keys(self, area: str, prefix: str = "") -> List[str]:
+        """Keys in an area starting with prefix, sorted"""
+
+    @abstractmethod
+    def exists(self, area: str, key: str) -> bool:
+        """Whether a file is stored under key"""
+
+    @abstractmethod
+    def delete(self, area: str, key: str):
+        """Remove a stored file; missing files are ignored"""
+
+    @abstractmethod
+    def local_path(self, area: str, key: str) -> str:
+        """Path of a local copy of the file, for tools that need one"""
+
+    @abstractmethod
+    async def response(self, area: str, key: str, request: Request, filename: Optional[str] = None) -> Response:
+        """Download response for a stored file"""
+
+
+class LocalStorage(StorageBackend):
+    """Files in the local directories configured in Settings
+
+    Downloads are handed to nginx with X-Accel-Redirect when
+    STORAGE_ACCEL_REDIRECT_PREFIX is set (nginx then serves them with
+    sendfile and handles ranges); otherwise they are streamed from disk,
+    honouring single byte ranges.
+    """
+
+    name = "local"
+
+    def __init__(self, accel_redirect_prefix: Optional[str] = None):
+        self.accel_redirect_prefix = accel_redirect_prefix
+
+    def _path(self, area: str, key: str) -> Path:
+        return Path(getattr(settings, STORAGE_AREAS[area])) / validate_key(area, key)
+
+    def put_file(self, area: str, key: str, source_path: str):
+        path = self._path(area, key)
+        if path.exists() and os.path.samefile(path, source_path):
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+
+    def put_bytes(self, area: str, key: str, data: bytes):
+        path = self._path(area, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def get_bytes(self, area: str, key: str) -> bytes:
+        return self._path(area, key).read_bytes()
+
+    def list_keys(self, area: str, prefix: str = "") -> List[str]:
+        root = Path(getattr(settings, STORAGE_AREAS[area]))
+        if not root.is_dir():
+            return []
+        keys = []
+        for path in root.rglob("*"):
+            # Skip in-progress ".name.tmp" writes
+            if path.is_file() and not path.name.startswith("."):
+                key = path.relative_to(root).as_posix()
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def exists(self, area: str, key: str) -> bool:
+        return self._path(area, key).is_file()
+
+    def delete(self, area: str, key: str):
+        self._path(area, key).unlink(missing_ok=True)
+
+    def local_path(self, area: str, key: str) -> str:
+        return str(self._path(area, key))
+
+    async def response(self, area: str, key: str, request: Request, filename: Optional[str] = None) -> Response:
+        path = self._path(area, key)
+        if not path.is_file():
+            raise DocumentComplianceException(f"File not found: {area}/{key}", status_code=404)
+        filename = filename or path.name
+
+        if self.accel_redirect_prefix:
+            return Response(headers={
+                "X-Accel-Redirect": f"{self.accel_redirect_prefix.rstrip('/')}/{area}/{validate_key(area, key)}",
+                "Content-Disposition": f'attachment; filename="{filename}"'
+            })
+
+        size = path.stat().st_size
+        byte_range = parse_range(request.headers["range"], size) if "range" in request.headers else None
+        if byte_range is None:
+            response = FileResponse(path, filename=filename)
+            response.headers["Accept-Ranges"] = "bytes"
+            return response
+
+        start, end = byte_range
+
+        async def read_range():
+            async with aiofiles.open(path, "rb") as f:
+                await f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = await f.read(min(RANGE_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+
+        return StreamingResponse(
+            read_range(),
+            status_code=206,
+            media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+            headers={
+                "Accept-Ranges": "bytes",
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+                "Content-Disposition": f'attachment; filename="{filename}"'
+            }
+        )
+
+
+class S3Storage(StorageBackend):
+    """Files in an S3-compatible bucket (AWS S3, MinIO, ...)
+
+    Large files are uploaded as parallel multipart uploads; downloads are
+    redirects to presigned URLs, so clients fetch (and range-request)
+    straight from the bucket. Local copies are cached under TEMP_PATH.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        presigned_url_ttl: int = 900
+    ):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+
+        if not bucket:
+            raise ValueError("S3_BUCKET must be set for S3 storage")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.presigned_url_ttl = presigned_url_ttl
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=settings.S3_MAX_CONCURRENCY,
+            use_threads=True
+        )
+        self.cache_path = Path(settings.TEMP_PATH) / "storage"
+
+    def _object_key(self, area: str, key: str) -> str:
+        object_key = f"{area}/{validate_key(area, key)}"
+        return f"{self.prefix}/{object_key}" if self.prefix else object_key
+
+    def put_file(self, area: str, key: str, source_path: str):
+        self.client.upload_file(source_path, self.bucket, self._object_key(area, key), Config=self.transfer_config)
+
+    def put_bytes(self, area: str, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self._object_key(area, key), Body=data)
+
+    def get_bytes(self, area: str, key: str) -> bytes:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._object_key(area, key))["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError(f"{area}/{key}")
+
+    def list_keys(self, area: str, prefix: str = "") -> List[str]:
+        if area not in STORAGE_AREAS:
+            raise DocumentComplianceException(f"Unknown storage area '{area}'", status_code=404)
+        area_prefix = f"{self.prefix}/{area}/" if self.prefix else f"{area}/"
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=area_prefix + prefix):
+            keys.extend(item["Key"][len(area_prefix):] for item in page.get("Contents", []))
+        return sorted(keys)
+
+    def exists(self, area: str, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(area, key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def delete(self, area: str, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(area, key))
+        (self.cache_path / area / validate_key(area, key)).unlink(missing_ok=True)
+
+    def local_path(self, area: str, key: str) -> str:
+        path = self.cache_path / area / validate_key(area, key)
+        if not path.is_file():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            self.client.download_file(
+                self.bucket, self._object_key(area, key), str(tmp_path), Config=self.transfer_config
+            )
+            os.replace(tmp_path, path)
+        return str(path)
+
+    async def response(self, area: str, key: str, request: Request, filename: Optional[str] = None) -> Response:
+        params = {"Bucket": self.bucket, "Key": self._object_key(area, key)}
+        if filename:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        url = self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=self.presigned_url_ttl)
+        return RedirectResponse(url, status_code=307)
+
+
+def create_storage(storage_type: Optional[str] = None) -> StorageBackend:
+    """Create the backend selected by STORAGE_TYPE"""
+    storage_type = storage_type or settings.STORAGE_TYPE
+    if storage_type == "local":
+        return LocalStorage(settings.STORAGE_ACCEL_REDIRECT_PREFIX)
+    if storage_type == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            presigned_url_ttl=settings.S3_PRESIGNED_URL_TTL
+        )
+    raise ValueError(
+        f"Unsupported storage type '{storage_type}'. "
+        f"Options: {', '.join(STORAGE_TYPES)}"
+    )
+
+
+def get_storage() -> StorageBackend:
+    """Return the process-wide storage backend"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = create_storage()
+            logger.info(f"Using {_storage.name} file storage")
+        return _storage
@@ -0,0 +1,247 @@
+"""
+Columnar storage for the words found on a page
+Word positions live in NumPy arrays and text in a plain list, so pipeline
+stages work on whole columns instead of one dataclass per word; per-word
+dicts are only built when a page result is materialized for the response
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# A word starts a new line when its center is further than this fraction of
+# the median word height from every line's most recent word
+LINE_GAP_RATIO = 0.5
+
+
+@dataclass
+class WordTable:
+    """Words on a page as parallel columns (pixel coordinates, confidence 0-1)"""
+    text: List[str]
+    x: np.ndarray
+    y: np.ndarray
+    width: np.ndarray
+    height: np.ndarray
+    confidence: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @classmethod
+    def empty(cls) -> "WordTable":
+        return cls(
+            text=[],
+            x=np.empty(0, dtype=np.int32),
+            y=np.empty(0, dtype=np.int32),
+            width=np.empty(0, dtype=np.int32),
+            height=np.empty(0, dtype=np.int32),
+            confidence=np.empty(0, dtype=np.float64)
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        text: Sequence[str],
+        x: Sequence[float],
+        y: Sequence[float],
+        width: Sequence[float],
+        height: Sequence[float],
+        confidence: Sequence[float],
+        dtype=np.float64
+    ) -> "WordTable":
+        """Build a table from column sequences; coordinates are stored as dtype"""
+        return cls(
+            text=list(text),
+            x=np.asarray(x, dtype=dtype),
+            y=np.asarray(y, dtype=dtype),
+            width=np.asarray(width, dtype=dtype),
+            height=np.asarray(height, dtype=dtype),
+            confidence=np.asarray(confidence, dtype=np.float64)
+        )
+
+    @classmethod
+    def from_elements(cls, elements) -> "WordTable":
+        """Build a table from TextElement objects"""
+        return cls.from_columns(
+            [e.text for e in elements],
+            [e.bounding_box.x for e in elements],
+            [e.bounding_box.y for e in elements],
+            [e.bounding_box.width for e in elements],
+            [e.bounding_box.height for e in elements],
+            [e.confidence for e in elements]
+        )
+
+    @classmethod
+    def concat(cls, tables: Sequence["WordTable"]) -> "WordTable":
+        tables = [t for t in tables if len(t)]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+        return cls(
+            text=[word for t in tables for word in t.text],
+            x=np.concatenate([t.x for t in tables]),
+            y=np.concatenate([t.y for t in tables]),
+            width=np.concatenate([t.width for t in tables]),
+            height=np.concatenate([t.height for t in tables]),
+            confidence=np.concatenate([t.confidence for t in tables])
+        )
+
+    def take(self, indices: np.ndarray) -> "WordTable":
+        """Return the words at the given indices, in that order"""
+        return WordTable(
+            text=[self.text[i] for i in indices.tolist()],
+            x=self.x[indices],
+            y=self.y[indices],
+            width=self.width[indices],
+            height=self.height[indices],
+            confidence=self.confidence[indices]
+        )
+
+    def offset(self, dx: float, dy: float) -> "WordTable":
+        """Return a copy shifted by (dx, dy), e.g. from crop to page coordinates"""
+        return WordTable(
+            text=self.text,
+            x=self.x + dx,
+            y=self.y + dy,
+            width=self.width,
+            height=self.height,
+            confidence=self.confidence
+        )
+
+    def boxes(self) -> np.ndarray:
+        """Return an (N, 4) array of x, y, width, height"""
+        return np.column_stack([self.x, self.y, self.width, self.height]).astype(np.float64)
+
+    def reading_order(self) -> np.ndarray:
+        """Indices sorted top-to-bottom, then left-to-right"""
+        return np.lexsort((self.x, self.y))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Materialize one dict per word, in the TextElement.to_dict() shape"""
+        return [
+            {
+                "text": text,
+                "bounding_box": {"x": x, "y": y, "width": w, "height": h},
+                "confidence": conf
+            }
+            for text, x, y, w, h, conf in zip(
+                self.text,
+                self.x.tolist(),
+                self.y.tolist(),
+                self.width.tolist(),
+                self.height.tolist(),
+                self.confidence.tolist()
+            )
+        ]
+
+
+@dataclass
+class TextLines:
+    """Lines of a page as index references into its WordTable
+
+    Words of line i are order[starts[i]:starts[i + 1]], sorted left to right.
+    """
+    order: np.ndarray
+    starts: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    width: np.ndarray
+    height: np.ndarray
+
+    def __len__(self) -> int:
+        return max(len(self.starts) - 1, 0)
+
+    @classmethod
+    def empty(cls) -> "TextLines":
+        return cls(
+            order=np.empty(0, dtype=np.intp),
+            starts=np.zeros(1, dtype=np.intp),
+            x=np.empty(0),
+            y=np.empty(0),
+            width=np.empty(0),
+            height=np.empty(0)
+        )
+
+    def to_dicts(self, words: WordTable, word_dicts: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Materialize line dicts, sharing the per-word dicts with the page"""
+        if word_dicts is None:
+            word_dicts = words.to_dicts()
+
+        order = self.order.tolist()
+        starts = self.starts.tolist()
+        lines = []
+        for i, (x, y, w, h) in enumerate(zip(
+            self.x.tolist(), self.y.tolist(), self.width.tolist(), self.height.tolist()
+        )):
+            line_words = order[starts[i]:starts[i + 1]]
+            lines.append({
+                "text": " ".join(words.text[j] for j in line_words),
+                "bounding_box": {"x": x, "y": y, "width": w, "height": h},
+                "words": [word_dicts[j] for j in line_words]
+            })
+        return lines
+
+
+def group_lines(words: WordTable, gap_ratio: float = LINE_GAP_RATIO) -> TextLines:
+    """Cluster words into lines by vertical center
+
+    Words are taken left to right and each joins the line whose most recent
+    word's center is nearest, if within gap_ratio x the median word height;
+    otherwise it starts a new line. Following each line's own anchor keeps
+    skewed lines apart (comparing consecutive centers in y order chains a
+    skewed page into one line), and the height-relative threshold behaves
+    the same at any rendering resolution.
+    """
+    n = len(words)
+    if n == 0:
+        return TextLines.empty()
+
+    center_y = (words.y + words.height / 2).astype(np.float64)
+    heights = words.height[words.height > 0]
+    threshold = gap_ratio * float(np.median(heights)) if heights.size else 0.0
+
+    line_ids = np.empty(n, dtype=np.intp)
+    anchors = np.empty(n, dtype=np.float64)
+    line_count = 0
+    for i in np.argsort(words.x, kind="stable").tolist():
+        cy = center_y[i]
+        if line_count:
+            distances = np.abs(anchors[:line_count] - cy)
+            nearest = int(distances.argmin())
+            if distances[nearest] <= threshold:
+                line_ids[i] = nearest
+                anchors[nearest] = cy
+                continue
+        line_ids[i] = line_count
+        anchors[line_count] = cy
+        line_count += 1
+
+    # Number lines top to bottom by mean center, then order each left to right
+    sizes = np.bincount(line_ids, minlength=line_count)
+    mean_y = np.bincount(line_ids, weights=center_y, minlength=line_count) / sizes
+    rank = np.empty(line_count, dtype=np.intp)
+    rank[np.argsort(mean_y, kind="stable")] = np.arange(line_count)
+    line_ids = rank[line_ids]
+    order = np.lexsort((words.x, line_ids))
+    starts = np.concatenate(([0], np.cumsum(np.bincount(line_ids, minlength=line_count)))).astype(np.intp)
+
+    x0 = words.x[order]
+    y0 = words.y[order]
+    x1 = x0 + words.width[order]
+    y1 = y0 + words.height[order]
+    line_starts = starts[:-1]
+    min_x = np.minimum.reduceat(x0, line_starts)
+    min_y = np.minimum.reduceat(y0, line_starts)
+    max_x = np.maximum.reduceat(x1, line_starts)
+    max_y = np.maximum.reduceat(y1, line_starts)
+
+    return TextLines(
+        order=order,
+        starts=starts,
+        x=min_x,
+        y=min_y,
+        width=max_x - min_x,
+        height=max_y - min_y
+    )
@@ -1,16 +1,121 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from prometheus_client import Counter, Gauge, Histogram
 from app.config import settings
+from typing import Optional
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-# Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DB_ECHO,
-    poolclass=NullPool,
+# Connection pool profiles:
+#   api  - long-lived server process serving many concurrent requests
+#   null - no pooling; a connection per session. Use it for Celery workers
+#          (each task drives async code on its own asyncio.run() loop and
+#          asyncpg connections cannot move between loops), scripts and
+#          one-off jobs
+DB_POOL_PROFILES = ("api", "null")
+
+# Pool metrics, exported through the app's /metrics endpoint
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Database connections currently checked out")
+DB_POOL_IDLE = Gauge("db_pool_idle", "Idle database connections held by the pool")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Database connections open beyond the pool size")
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for (or opening) a database connection",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
 )
+DB_POOL_CONNECTIONS_OPENED = Counter("db_pool_connections_opened_total", "Database connections opened")
+DB_POOL_CONNECTIONS_INVALIDATED = Counter(
+    "db_pool_connections_invalidated_total", "Database connections discarded as broken or stale"
+)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+def _pool_options(profile: str) -> dict:
+    """Engine pool arguments for a profile."""
+    if profile not in DB_POOL_PROFILES:
+        raise ValueError(
+            f"Unsupported database pool profile '{profile}'. "
+            f"Options: {', '.join(DB_POOL_PROFILES)}"
+        )
+    if profile == "null":
+        return {"poolclass": NullPool}
+
+    return {
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def create_db_engine(profile: Optional[str] = None) -> AsyncEngine:
+    """Create the async engine for a pool profile (default: DB_POOL_PROFILE)."""
+    profile = profile or settings.DB_POOL_PROFILE
+    connect_args = {}
+    if settings.DATABASE_URL.startswith("postgresql+asyncpg"):
+        # SQLAlchemy's and asyncpg's per-connection prepared statement caches
+        # (0 disables both, as PgBouncer transaction pooling requires)
+        connect_args = {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+
+    db_engine = create_async_engine(
+        settings.DATABASE_URL,
+        echo=settings.DB_ECHO,
+        connect_args=connect_args,
+        **_pool_options(profile),
+    )
+
+    pool = db_engine.sync_engine.pool
+    if isinstance(pool, InstrumentedAsyncPool):
+        DB_POOL_CHECKED_OUT.set_function(pool.checkedout)
+        DB_POOL_IDLE.set_function(pool.checkedin)
+        DB_POOL_OVERFLOW.set_function(lambda: max(pool.overflow(), 0))
+
+    @event.listens_for(db_engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS_OPENED.inc()
+
+    @event.listens_for(db_engine.sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_CONNECTIONS_INVALIDATED.inc()
+
+    logger.info(f"Database engine created with '{profile}' pool profile")
+    return db_engine
+
+
+def get_pool_stats() -> dict:
+    """Snapshot of the engine's connection pool, for health checks."""
+    pool = engine.sync_engine.pool
+    if not isinstance(pool, InstrumentedAsyncPool):
+        return {"profile": settings.DB_POOL_PROFILE}
+    return {
+        "profile": settings.DB_POOL_PROFILE,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
+# Create async engine
+engine = create_db_engine()
 
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -47,3 +152,8 @@ async def init_db():
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
         raise
+
+
+async def close_db():
+    """Close pooled connections, e.g. on application shutdown."""
+    await engine.dispose()
@@ -3,14 +3,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from app.config import settings
 from app.api.v1.api import api_router
-from app.db.session import init_db
+from app.db.session import close_db, get_pool_stats, init_db
+from app.core.analysis_executor import get_analysis_executor, shutdown_analysis_executor
 from app.core.exceptions import setup_exception_handlers
+from app.core.model_registry import preload_models
+from app.core.ocr_engines import shutdown_ocr_engines
+from app.core.page_scheduler import shutdown_page_schedulers
 from app.utils.logger import setup_logging
 
 
@@ -31,10 +36,18 @@ async def lifespan(app: FastAPI):
     # Create upload directory if it doesn't exist
     os.makedirs(settings.UPLOAD_PATH, exist_ok=True)
     
+    # Load analysis models up front instead of on the first request
+    if settings.PRELOAD_MODELS:
+        await asyncio.to_thread(preload_models)
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Document Compliance System...")
+    shutdown_analysis_executor()
+    shutdown_page_schedulers()
+    shutdown_ocr_engines()
+    await close_db()
 
 
 # Create FastAPI application
@@ -82,5 +95,7 @@ async def health_check():
         "status": "healthy",
         "app_name": settings.APP_NAME,
         "version": settings.APP_VERSION,
-        "environment": settings.ENVIRONMENT
+        "environment": settings.ENVIRONMENT,
+        "analysis": get_analysis_executor().stats(),
+        "database_pool": get_pool_stats()
     }
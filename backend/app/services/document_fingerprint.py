@@ -0,0 +1,174 @@
+"""
+Document fingerprints for template matching.
+A fingerprint holds, per page, a 64-bit perceptual hash, a small grayscale
+thumbnail and the normalized layout element boxes. Fingerprints are cheap to
+compare and are stored next to each template as a compressed .npz file.
+"""
+
+import asyncio
+import io
+import logging
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from app.core.analysis_cache import hash_file
+from app.core.page_raster import fitz_lock
+
+logger = logging.getLogger(__name__)
+
+# Version of the .npz layout written by DocumentFingerprint.to_bytes()
+FINGERPRINT_FORMAT_VERSION = 1
+
+# Thumbnail size (width, height); pages are squashed to it regardless of
+# aspect ratio so every thumbnail stacks into one array
+THUMBNAIL_SIZE = (96, 128)
+
+# Resolution pages are rendered at for hashing and thumbnails
+FINGERPRINT_DPI = 50
+
+
+@dataclass
+class PageFingerprint:
+    """Features of one page."""
+    phash: int
+    thumbnail: np.ndarray  # (height, width) uint8 grayscale
+    layout_boxes: np.ndarray = field(default_factory=lambda: np.empty((0, 4), dtype=np.float32))  # x0, y0, x1, y1 in 0-1
+    layout_types: List[str] = field(default_factory=list)
+
+
+@dataclass
+class DocumentFingerprint:
+    """Features of every page of a document."""
+    content_hash: str
+    pages: List[PageFingerprint]
+
+    @property
+    def phashes(self) -> np.ndarray:
+        return np.array([page.phash for page in self.pages], dtype=np.uint64)
+
+    @property
+    def thumbnails(self) -> np.ndarray:
+        """(pages, height, width) uint8 stack."""
+        if not self.pages:
+            return np.empty((0, THUMBNAIL_SIZE[1], THUMBNAIL_SIZE[0]), dtype=np.uint8)
+        return np.stack([page.thumbnail for page in self.pages])
+
+    def to_bytes(self) -> bytes:
+        """Serialize the fingerprint as a compressed .npz file."""
+        boxes = [page.layout_boxes for page in self.pages]
+        counts = [len(b) for b in boxes]
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            version=np.array(FINGERPRINT_FORMAT_VERSION),
+            content_hash=np.array(self.content_hash),
+            phashes=self.phashes,
+            thumbnails=self.thumbnails,
+            layout_offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+            layout_boxes=np.concatenate(boxes).astype(np.float32) if boxes else np.empty((0, 4), dtype=np.float32),
+            layout_types=np.array([t for page in self.pages for t in page.layout_types], dtype=str)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "DocumentFingerprint":
+        """Read a fingerprint written by to_bytes()."""
+        with np.load(io.BytesIO(raw), allow_pickle=False) as data:
+            version = int(data["version"])
+            if version != FINGERPRINT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported fingerprint format version {version}")
+            offsets = data["layout_offsets"]
+            boxes = data["layout_boxes"]
+            types = data["layout_types"].tolist()
+            pages = [
+                PageFingerprint(
+                    phash=int(phash),
+                    thumbnail=thumbnail,
+                    layout_boxes=boxes[start:end],
+                    layout_types=types[start:end]
+                )
+                for phash, thumbnail, start, end in zip(
+                    data["phashes"].tolist(), data["thumbnails"], offsets[:-1], offsets[1:]
+                )
+            ]
+            return cls(content_hash=str(data["content_hash"]), pages=pages)
+
+
+def iter_page_images(document_path: str, dpi: int = FINGERPRINT_DPI) -> Iterator[Image.Image]:
+    """Yield grayscale renders of each page of a PDF or image file."""
+    if not document_path.lower().endswith(".pdf"):
+        with Image.open(document_path) as image:
+            yield image.convert("L")
+        return
+
+    zoom = dpi / 72
+    matrix = fitz.Matrix(zoom, zoom)
+    with fitz_lock:
+        pdf_document = fitz.open(document_path)
+    try:
+        for page_index in range(pdf_document.page_count):
+            with fitz_lock:
+                pix = pdf_document[page_index].get_pixmap(matrix=matrix, colorspace=fitz.csGRAY, alpha=False)
+                image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+            yield image
+    finally:
+        with fitz_lock:
+            pdf_document.close()
+
+
+def fingerprint_page(image: Image.Image) -> Tuple[int, np.ndarray]:
+    """Return the 64-bit perceptual hash and thumbnail of a page image."""
+    import imagehash
+
+    phash = int(str(imagehash.phash(image)), 16)
+    thumbnail = np.asarray(image.convert("L").resize(THUMBNAIL_SIZE, Image.BILINEAR), dtype=np.uint8)
+    return phash, thumbnail
+
+
+def normalize_layout(page_data: dict) -> Tuple[np.ndarray, List[str]]:
+    """Convert a page's layout elements into boxes scaled to the unit square."""
+    width = float(page_data.get("width") or 1)
+    height = float(page_data.get("height") or 1)
+    boxes = []
+    types = []
+    for element in page_data.get("layout_elements", []):
+        bbox = element["bounding_box"]
+        boxes.append((
+            bbox["x"] / width,
+            bbox["y"] / height,
+            (bbox["x"] + bbox["width"]) / width,
+            (bbox["y"] + bbox["height"]) / height
+        ))
+        types.append(element["type"])
+    return np.clip(np.array(boxes, dtype=np.float32).reshape(-1, 4), 0, 1), types
+
+
+def compute_fingerprint(document_path: str, layout: Optional[dict] = None, content_hash: Optional[str] = None) -> DocumentFingerprint:
+    """Fingerprint a document (CPU-bound).
+
+    `layout` is an analyze_document_layout() result with the "layout" feature;
+    without it the fingerprint has hashes and thumbnails only.
+    """
+    layout_pages = (layout or {}).get("pages", [])
+    pages = []
+    for page_index, image in enumerate(iter_page_images(document_path)):
+        phash, thumbnail = fingerprint_page(image)
+        image.close()
+        page = PageFingerprint(phash=phash, thumbnail=thumbnail)
+        if page_index < len(layout_pages):
+            page.layout_boxes, page.layout_types = normalize_layout(layout_pages[page_index])
+        pages.append(page)
+
+    return DocumentFingerprint(content_hash=content_hash or hash_file(document_path), pages=pages)
+
+
+async def fingerprint_document(document_path: str, document_client=None) -> DocumentFingerprint:
+    """Analyze a document's layout and fingerprint it without blocking the event loop."""
+    layout = None
+    if document_client is not None:
+        layout = await document_client.analyze_document_layout(document_path, ["layout"])
+    return await asyncio.to_thread(compute_fingerprint, document_path, layout)
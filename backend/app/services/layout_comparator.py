@@ -0,0 +1,178 @@
+"""
+Layout comparison between submission and template pages.
+Elements are paired by solving an assignment problem on a (1 - IoU) cost
+matrix in which elements of different types can never be paired; unpaired
+template elements are missing from the submission and unpaired submission
+elements are extra. All boxes are in page-normalized (0-1) coordinates.
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from app.services.document_fingerprint import PageFingerprint
+
+# Paired elements overlapping less than this are reported as missing + extra
+LAYOUT_MIN_IOU = 0.1
+
+# Cost of pairing elements of different types; above any real (1 - IoU) cost
+INCOMPATIBLE_COST = 2.0
+
+
+@dataclass
+class ElementDeviation:
+    """How one template element differs from its submission counterpart."""
+    status: str  # "matched", "missing" (template only) or "extra" (submission only)
+    type: str
+    template_index: Optional[int] = None
+    submission_index: Optional[int] = None
+    iou: float = 0.0
+    dx: float = 0.0  # Center shift, submission minus template
+    dy: float = 0.0
+    dw: float = 0.0  # Size change, submission minus template
+    dh: float = 0.0
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class LayoutComparison:
+    """Element pairing between two pages and the resulting layout score."""
+    score: float  # 2 x summed IoU of matched pairs / total element count
+    matched: int
+    missing: int
+    extra: int
+    deviations: List[ElementDeviation] = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "score": self.score,
+            "matched": self.matched,
+            "missing": self.missing,
+            "extra": self.extra,
+            "deviations": [deviation.to_dict() for deviation in self.deviations]
+        }
+
+
+def pad_layouts(pages: Sequence[PageFingerprint], type_codes: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack variable-length layouts into (P, N, 4) boxes and (P, N) type codes (-1 = padding)."""
+    width = max((len(page.layout_types) for page in pages), default=0)
+    boxes = np.zeros((len(pages), width, 4))
+    types = np.full((len(pages), width), -1)
+    for i, page in enumerate(pages):
+        count = len(page.layout_types)
+        boxes[i, :count] = page.layout_boxes
+        types[i, :count] = [type_codes.setdefault(t, len(type_codes)) for t in page.layout_types]
+    return boxes, types
+
+
+def pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU of every box in a (..., N, 4) against every box in b (..., M, 4), as (..., N, M)."""
+    a = a[..., :, None, :]
+    b = b[..., None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def _compare(
+    sub_page: PageFingerprint,
+    tmpl_page: PageFingerprint,
+    iou: np.ndarray,
+    compatible: np.ndarray,
+    min_iou: float
+) -> LayoutComparison:
+    """Pair the elements of one page pair given its IoU and compatibility matrices."""
+    n_sub, n_tmpl = iou.shape
+    if n_sub + n_tmpl == 0:
+        return LayoutComparison(score=1.0, matched=0, missing=0, extra=0)
+
+    rows = cols = np.empty(0, dtype=np.intp)
+    if n_sub and n_tmpl:
+        cost = np.where(compatible, 1.0 - iou, INCOMPATIBLE_COST)
+        rows, cols = linear_sum_assignment(cost)
+        keep = compatible[rows, cols] & (iou[rows, cols] >= min_iou)
+        rows, cols = rows[keep], cols[keep]
+
+    pair_iou = iou[rows, cols]
+    sub_boxes = np.asarray(sub_page.layout_boxes, dtype=np.float64)[rows]
+    tmpl_boxes = np.asarray(tmpl_page.layout_boxes, dtype=np.float64)[cols]
+    shift = (sub_boxes[:, :2] + sub_boxes[:, 2:]) / 2 - (tmpl_boxes[:, :2] + tmpl_boxes[:, 2:]) / 2
+    resize = (sub_boxes[:, 2:] - sub_boxes[:, :2]) - (tmpl_boxes[:, 2:] - tmpl_boxes[:, :2])
+
+    deviations = [
+        ElementDeviation(
+            status="matched",
+            type=tmpl_page.layout_types[col],
+            template_index=col,
+            submission_index=row,
+            iou=overlap,
+            dx=dx,
+            dy=dy,
+            dw=dw,
+            dh=dh
+        )
+        for row, col, overlap, (dx, dy), (dw, dh) in zip(
+            rows.tolist(), cols.tolist(), pair_iou.tolist(), shift.tolist(), resize.tolist()
+        )
+    ]
+    missing = np.setdiff1d(np.arange(n_tmpl), cols)
+    extra = np.setdiff1d(np.arange(n_sub), rows)
+    deviations.extend(
+        ElementDeviation(status="missing", type=tmpl_page.layout_types[i], template_index=i)
+        for i in missing.tolist()
+    )
+    deviations.extend(
+        ElementDeviation(status="extra", type=sub_page.layout_types[i], submission_index=i)
+        for i in extra.tolist()
+    )
+
+    return LayoutComparison(
+        score=float(2 * pair_iou.sum() / (n_sub + n_tmpl)),
+        matched=len(rows),
+        missing=len(missing),
+        extra=len(extra),
+        deviations=deviations
+    )
+
+
+def batch_compare_layouts(
+    submission_pages: Sequence[PageFingerprint],
+    template_pages: Sequence[PageFingerprint],
+    min_iou: float = LAYOUT_MIN_IOU
+) -> List[LayoutComparison]:
+    """Compare each submission page with the template page at the same position.
+
+    IoU and type-compatibility matrices for all pairs are built in one padded
+    NumPy pass; each pair's assignment is then solved on its own submatrix.
+    """
+    type_codes: Dict[str, int] = {}
+    sub_boxes, sub_types = pad_layouts(submission_pages, type_codes)
+    tmpl_boxes, tmpl_types = pad_layouts(template_pages, type_codes)
+
+    iou = pairwise_iou(sub_boxes, tmpl_boxes)
+    compatible = (
+        (sub_types[:, :, None] == tmpl_types[:, None, :])
+        & (sub_types[:, :, None] >= 0)
+        & (tmpl_types[:, None, :] >= 0)
+    )
+
+    comparisons = []
+    for i, (sub_page, tmpl_page) in enumerate(zip(submission_pages, template_pages)):
+        n_sub, n_tmpl = len(sub_page.layout_types), len(tmpl_page.layout_types)
+        comparisons.append(_compare(
+            sub_page, tmpl_page, iou[i, :n_sub, :n_tmpl], compatible[i, :n_sub, :n_tmpl], min_iou
+        ))
+    return comparisons
+
+
+def compare_layouts(submission_page: PageFingerprint, template_page: PageFingerprint, min_iou: float = LAYOUT_MIN_IOU) -> LayoutComparison:
+    """Compare the layouts of a single page pair."""
+    return batch_compare_layouts([submission_page], [template_page], min_iou)[0]
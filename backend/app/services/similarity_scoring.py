@@ -0,0 +1,234 @@
+"""
+Similarity scoring between submissions and templates.
+Every aligned page pair of every candidate template is scored in one batch:
+SSIM over stacked thumbnails, XOR popcount over packed perceptual hashes and
+layout element assignment on IoU matrices, combined with SSIM_WEIGHT,
+PERCEPTUAL_HASH_WEIGHT and LAYOUT_MATCH_WEIGHT. SSIM, the expensive part, is
+skipped for pages (or whole templates) already provably below the threshold.
+"""
+
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.document_fingerprint import DocumentFingerprint
+from app.services.layout_comparator import LayoutComparison, batch_compare_layouts
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+# scikit-image's structural_similarity defaults
+SSIM_WINDOW = 7
+SSIM_K1 = 0.01
+SSIM_K2 = 0.03
+
+
+@dataclass
+class PageScore:
+    """Similarity of one submission page to the template page at the same index."""
+    page_number: int
+    hash_similarity: float
+    layout_similarity: float
+    ssim: Optional[float]  # None when skipped because the page could no longer pass
+    score: float  # Weighted score; a skipped ssim counts as 0
+    upper_bound: float  # Best score a perfect SSIM could give; equals score when ssim was measured
+    passed: bool
+    layout: Optional[LayoutComparison] = None  # Element pairing and deviations
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class DocumentScore:
+    """Similarity of a submission to one template."""
+    template_id: str
+    score: float  # Mean measured page score; missing or extra pages count as 0
+    upper_bound: float  # Mean page upper bound; above score when SSIM was skipped
+    passed: bool
+    threshold: float
+    submission_pages: int
+    template_pages: int
+    complete: bool  # False when SSIM was skipped for some pages
+    early_exit: bool  # True when scoring stopped early because the template could not pass
+    pages: List[PageScore] = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            **{k: v for k, v in asdict(self).items() if k != "pages"},
+            "pages": [page.to_dict() for page in self.pages]
+        }
+
+
+def batch_ssim(a: np.ndarray, b: np.ndarray, data_range: float = 255.0) -> np.ndarray:
+    """Mean SSIM of each pair of images in two (N, H, W) stacks
+
+    Matches skimage.metrics.structural_similarity with its defaults (7x7
+    uniform window, sample covariance, borders excluded from the mean).
+    """
+    from scipy.ndimage import uniform_filter
+
+    if len(a) == 0:
+        return np.empty(0)
+
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    size = (1, SSIM_WINDOW, SSIM_WINDOW)
+
+    mean_a = uniform_filter(a, size)
+    mean_b = uniform_filter(b, size)
+    mean_aa = uniform_filter(a * a, size)
+    mean_bb = uniform_filter(b * b, size)
+    mean_ab = uniform_filter(a * b, size)
+
+    cov_norm = SSIM_WINDOW ** 2 / (SSIM_WINDOW ** 2 - 1)
+    var_a = cov_norm * (mean_aa - mean_a * mean_a)
+    var_b = cov_norm * (mean_bb - mean_b * mean_b)
+    cov_ab = cov_norm * (mean_ab - mean_a * mean_b)
+
+    c1 = (SSIM_K1 * data_range) ** 2
+    c2 = (SSIM_K2 * data_range) ** 2
+    ssim_map = (
+        (2 * mean_a * mean_b + c1) * (2 * cov_ab + c2)
+        / ((mean_a ** 2 + mean_b ** 2 + c1) * (var_a + var_b + c2))
+    )
+
+    pad = (SSIM_WINDOW - 1) // 2
+    return ssim_map[:, pad:-pad, pad:-pad].mean(axis=(1, 2))
+
+
+def batch_hash_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """1 - normalized Hamming distance between paired 64-bit hashes"""
+    xor = np.bitwise_xor(np.asarray(a, dtype=np.uint64), np.asarray(b, dtype=np.uint64))
+    distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+    return 1.0 - distances / HASH_BITS
+
+
+class SimilarityScorer:
+    """Weighted SSIM / perceptual hash / layout scoring of submissions against templates."""
+
+    def __init__(
+        self,
+        ssim_weight: Optional[float] = None,
+        hash_weight: Optional[float] = None,
+        layout_weight: Optional[float] = None,
+        threshold: Optional[float] = None
+    ):
+        weights = np.array([
+            settings.SSIM_WEIGHT if ssim_weight is None else ssim_weight,
+            settings.PERCEPTUAL_HASH_WEIGHT if hash_weight is None else hash_weight,
+            settings.LAYOUT_MATCH_WEIGHT if layout_weight is None else layout_weight
+        ], dtype=np.float64)
+        if weights.sum() <= 0:
+            raise ValueError("Similarity weights must sum to a positive value")
+        self.ssim_weight, self.hash_weight, self.layout_weight = weights / weights.sum()
+        self.threshold = settings.DEFAULT_SIMILARITY_THRESHOLD if threshold is None else threshold
+
+    def score(self, submission: DocumentFingerprint, template: DocumentFingerprint, template_id: str = "", early_exit: bool = True) -> DocumentScore:
+        """Score a submission against a single template."""
+        return self.score_templates(submission, {template_id: template}, early_exit)[0]
+
+    def score_templates(
+        self,
+        submission: DocumentFingerprint,
+        templates: Dict[str, DocumentFingerprint],
+        early_exit: bool = True
+    ) -> List[DocumentScore]:
+        """Score a submission against several templates, best first
+
+        Page i of the submission is paired with page i of each template and
+        all pairs are scored together. With early_exit, SSIM is skipped for
+        every pair of a template that already has a page (or a page count
+        mismatch) that cannot reach the threshold, and counted as 0 in its
+        score; without it every pair is fully scored.
+        """
+        template_ids = list(templates)
+        pairs: List[Tuple[int, int]] = []  # (template position, page index)
+        for position, template_id in enumerate(template_ids):
+            aligned = min(len(submission.pages), len(templates[template_id].pages))
+            pairs.extend((position, page_index) for page_index in range(aligned))
+
+        sub_pages = [submission.pages[page_index] for _, page_index in pairs]
+        tmpl_pages = [templates[template_ids[position]].pages[page_index] for position, page_index in pairs]
+
+        # Cheap components first
+        hash_scores = batch_hash_similarity(
+            np.array([p.phash for p in sub_pages], dtype=np.uint64),
+            np.array([p.phash for p in tmpl_pages], dtype=np.uint64)
+        ) if pairs else np.empty(0)
+        layout_comparisons = batch_compare_layouts(sub_pages, tmpl_pages) if pairs else []
+        layout_scores = np.array([comparison.score for comparison in layout_comparisons])
+        partial = self.hash_weight * hash_scores + self.layout_weight * layout_scores
+
+        # A pair whose score with a perfect SSIM is still below the threshold cannot pass
+        upper_bound = partial + self.ssim_weight
+        needs_ssim = np.ones(len(pairs), dtype=bool)
+        if early_exit and pairs:
+            hopeless = upper_bound < self.threshold
+            needs_ssim &= ~hopeless
+            positions = np.array([position for position, _ in pairs])
+            failed_templates = set(positions[hopeless].tolist())
+            failed_templates.update(
+                position for position, template_id in enumerate(template_ids)
+                if len(templates[template_id].pages) != len(submission.pages)
+            )
+            needs_ssim &= ~np.isin(positions, list(failed_templates))
+
+        # Expensive component only where it can change the outcome
+        ssim_scores = np.full(len(pairs), np.nan)
+        if needs_ssim.any():
+            selected = np.flatnonzero(needs_ssim)
+            ssim_scores[selected] = batch_ssim(
+                np.stack([sub_pages[i].thumbnail for i in selected]),
+                np.stack([tmpl_pages[i].thumbnail for i in selected])
+            )
+        # A skipped SSIM counts as 0, so early-exited scores never exceed measured ones
+        measured = ~np.isnan(ssim_scores)
+        totals = partial + self.ssim_weight * np.nan_to_num(ssim_scores)
+        bounds = np.where(measured, totals, upper_bound)
+
+        results = []
+        for position, template_id in enumerate(template_ids):
+            template = templates[template_id]
+            page_scores = [
+                PageScore(
+                    page_number=page_index + 1,
+                    hash_similarity=float(hash_scores[i]),
+                    layout_similarity=float(layout_scores[i]),
+                    ssim=None if np.isnan(ssim_scores[i]) else float(ssim_scores[i]),
+                    score=float(totals[i]),
+                    upper_bound=float(bounds[i]),
+                    passed=bool(measured[i] and totals[i] >= self.threshold),
+                    layout=layout_comparisons[i]
+                )
+                for i, (pair_position, page_index) in enumerate(pairs)
+                if pair_position == position
+            ]
+            page_count = max(len(submission.pages), len(template.pages), 1)
+            results.append(DocumentScore(
+                template_id=template_id,
+                score=sum(page.score for page in page_scores) / page_count,
+                upper_bound=sum(page.upper_bound for page in page_scores) / page_count,
+                passed=(
+                    len(submission.pages) == len(template.pages)
+                    and bool(page_scores)
+                    and all(page.passed for page in page_scores)
+                ),
+                threshold=self.threshold,
+                submission_pages=len(submission.pages),
+                template_pages=len(template.pages),
+                complete=all(page.ssim is not None for page in page_scores),
+                early_exit=any(page.ssim is None for page in page_scores),
+                pages=page_scores
+            ))
+
+        results.sort(key=lambda result: (result.passed, result.score), reverse=True)
+        logger.debug(
+            f"Scored {len(pairs)} page pairs against {len(templates)} templates; "
+            f"SSIM computed for {int(needs_ssim.sum()) if pairs else 0}"
+        )
+        return results
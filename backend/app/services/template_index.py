@@ -0,0 +1,154 @@
+"""
+Candidate retrieval index over template page hashes.
+A BK-tree keyed by 64-bit perceptual hashes answers "which template pages
+are within Hamming distance d of this page" without scanning every template,
+so a submission is only compared in full against its closest templates.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.services.document_fingerprint import DocumentFingerprint
+
+# Hash bits; a page further than this from every template page matches nothing
+HASH_BITS = 64
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Metric tree over integer hashes under Hamming distance."""
+
+    def __init__(self):
+        # Node: [hash, values, {distance: child}]
+        self._root = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: int, value):
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key: int, max_distance: int) -> List[Tuple[int, object]]:
+        """Return (distance, value) for every entry within max_distance."""
+        results = []
+        if self._root is None:
+            return results
+
+        pending = [self._root]
+        while pending:
+            node = pending.pop()
+            distance = hamming_distance(key, node[0])
+            if distance <= max_distance:
+                results.extend((distance, value) for value in node[1])
+            # Triangle inequality: only children in this band can be in range
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+        return results
+
+
+@dataclass
+class TemplateCandidate:
+    """A template ranked by how closely its page hashes match a submission."""
+    template_id: str
+    distance: float  # Mean best-page Hamming distance over the submission's pages
+    matched_pages: int  # Submission pages with a template page within range
+
+    def to_dict(self):
+        return {
+            "template_id": self.template_id,
+            "distance": self.distance,
+            "matched_pages": self.matched_pages
+        }
+
+
+class TemplateIndex:
+    """Thread-safe index of template fingerprints."""
+
+    def __init__(self):
+        self._fingerprints: Dict[str, DocumentFingerprint] = {}
+        self._tree = BKTree()
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def __contains__(self, template_id: str) -> bool:
+        return template_id in self._fingerprints
+
+    def get(self, template_id: str) -> Optional[DocumentFingerprint]:
+        return self._fingerprints.get(template_id)
+
+    def add(self, template_id: str, fingerprint: DocumentFingerprint):
+        with self._lock:
+            if template_id in self._fingerprints:
+                # BK-trees cannot drop entries; rebuild on next search
+                self._stale = True
+            else:
+                self._insert(template_id, fingerprint)
+            self._fingerprints[template_id] = fingerprint
+
+    def remove(self, template_id: str):
+        with self._lock:
+            if self._fingerprints.pop(template_id, None) is not None:
+                self._stale = True
+
+    def _insert(self, template_id: str, fingerprint: DocumentFingerprint):
+        for page_index, page in enumerate(fingerprint.pages):
+            self._tree.add(page.phash, (template_id, page_index))
+
+    def _rebuild(self):
+        self._tree = BKTree()
+        for template_id, fingerprint in self._fingerprints.items():
+            self._insert(template_id, fingerprint)
+        self._stale = False
+
+    def candidates(self, fingerprint: DocumentFingerprint, top_k: int, max_distance: int) -> List[TemplateCandidate]:
+        """Return up to top_k templates with pages within max_distance, closest first.
+
+        Each submission page contributes its best distance to any page of a
+        template; pages with no match count as max_distance + 1.
+        """
+        if not fingerprint.pages:
+            return []
+
+        with self._lock:
+            if self._stale:
+                self._rebuild()
+            best: Dict[str, List[int]] = {}
+            for page_index, page in enumerate(fingerprint.pages):
+                for distance, (template_id, _) in self._tree.search(page.phash, max_distance):
+                    distances = best.setdefault(template_id, [max_distance + 1] * len(fingerprint.pages))
+                    distances[page_index] = min(distances[page_index], distance)
+
+        ranked = [
+            TemplateCandidate(
+                template_id=template_id,
+                distance=sum(distances) / len(distances),
+                matched_pages=sum(d <= max_distance for d in distances)
+            )
+            for template_id, distances in best.items()
+        ]
+        ranked.sort(key=lambda c: (-c.matched_pages, c.distance, c.template_id))
+        return ranked[:top_k]
@@ -1,20 +1,194 @@
 """
 Template service for handling template operations.
-This is a placeholder - full implementation will be added based on requirements.
+Templates are fingerprinted once at upload time (perceptual hashes, layout
+vectors and thumbnails per page); the fingerprints are persisted in the
+"templates" storage area and indexed so submissions are only compared in full against
+their closest templates.
 """
 
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+from app.config import settings
+from app.core.exceptions import DocumentComplianceException
+from app.core.storage import StorageBackend, get_storage
+from app.services.document_fingerprint import DocumentFingerprint, compute_fingerprint, fingerprint_document
+from app.services.similarity_scoring import DocumentScore, SimilarityScorer
+from app.services.template_index import TemplateCandidate, TemplateIndex
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FILENAME = "fingerprint.npz"
+METADATA_FILENAME = "template.json"
+TEMPLATES_AREA = "templates"
+
+
 class TemplateService:
     """Service for template management and analysis."""
-    
-    def __init__(self):
-        pass
-    
-    async def create_template(self, template_data):
-        """Create a new template."""
-        # Implementation will be added
-        pass
-    
-    async def analyze_template(self, template):
+
+    def __init__(self, storage: Optional[StorageBackend] = None, document_client=None):
+        self.storage = storage or get_storage()
+        self._document_client = document_client
+        self.index = TemplateIndex()
+        self.scorer = SimilarityScorer()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def document_client(self):
+        """Client used for template layout analysis, created on first use.
+
+        Defaults to the executor-backed wrapper, so template analysis shares
+        the API's concurrency limit, timeout and cancellation.
+        """
+        if self._document_client is None:
+            from app.core.opensource_document_client import DocumentAnalysisCompatibilityWrapper
+            self._document_client = DocumentAnalysisCompatibilityWrapper()
+        return self._document_client
+
+    async def create_template(self, template_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new template.
+
+        template_data needs a "file_path"; "template_id" and "name" are
+        optional. The template is fingerprinted, persisted and indexed.
+        """
+        file_path = template_data.get("file_path")
+        if not file_path or not os.path.isfile(file_path):
+            raise DocumentComplianceException(f"Template file not found: {file_path}", status_code=400)
+
+        template_id = str(template_data.get("template_id") or uuid.uuid4())
+        fingerprint = await self.analyze_template(template_data)
+
+        metadata = {
+            "template_id": template_id,
+            "name": template_data.get("name") or os.path.basename(file_path),
+            "file_path": file_path,
+            "content_hash": fingerprint.content_hash,
+            "pages": len(fingerprint.pages),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        await asyncio.to_thread(self._save_template, template_id, fingerprint, metadata)
+
+        await self._ensure_loaded()
+        self.index.add(template_id, fingerprint)
+        logger.info(f"Indexed template {template_id} ({metadata['pages']} pages)")
+        return metadata
+
+    async def analyze_template(self, template: Union[Dict[str, Any], str]) -> DocumentFingerprint:
         """Analyze template to extract features."""
-        # Implementation will be added
-        pass
+        file_path = template["file_path"] if isinstance(template, dict) else template
+        return await fingerprint_document(file_path, self.document_client)
+
+    async def get_template(self, template_id: str) -> Optional[Dict[str, Any]]:
+        """Return a template's stored metadata."""
+        try:
+            data = await asyncio.to_thread(self.storage.get_bytes, TEMPLATES_AREA, f"{template_id}/{METADATA_FILENAME}")
+        except FileNotFoundError:
+            return None
+        return json.loads(data)
+
+    async def get_fingerprint(self, template_id: str) -> Optional[DocumentFingerprint]:
+        """Return a template's fingerprint from the index."""
+        await self._ensure_loaded()
+        return self.index.get(template_id)
+
+    async def delete_template(self, template_id: str):
+        """Remove a template's fingerprint from storage and from the index."""
+        await self._ensure_loaded()
+        self.index.remove(template_id)
+        for filename in (FINGERPRINT_FILENAME, METADATA_FILENAME):
+            await asyncio.to_thread(self.storage.delete, TEMPLATES_AREA, f"{template_id}/{filename}")
+
+    async def find_candidates(
+        self,
+        document: Union[str, DocumentFingerprint],
+        top_k: Optional[int] = None,
+        max_distance: Optional[int] = None
+    ) -> List[TemplateCandidate]:
+        """Return the templates a submission should be compared against, closest first.
+
+        document is a file path or an already computed fingerprint. Retrieval
+        only needs page hashes, so a path is fingerprinted without layout
+        analysis.
+        """
+        await self._ensure_loaded()
+        if isinstance(document, str):
+            document = await fingerprint_document(document)
+
+        return self.index.candidates(
+            document,
+            top_k=top_k or settings.TEMPLATE_CANDIDATES_TOP_K,
+            max_distance=settings.TEMPLATE_HASH_MAX_DISTANCE if max_distance is None else max_distance
+        )
+
+    async def match_document(
+        self,
+        document_path: str,
+        layout: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        template_ids: Optional[List[str]] = None,
+        content_hash: Optional[str] = None
+    ) -> List[DocumentScore]:
+        """Score a submission against its closest templates, best first.
+
+        layout is the submission's analyze_document_layout() result; it is
+        analyzed here when not given. With template_ids, the submission is
+        scored against exactly those templates instead of retrieved candidates.
+        content_hash is the file's SHA-256 when the caller already has it, so
+        the file is not read again to hash it.
+        """
+        if layout is None:
+            layout = await self.document_client.analyze_document_layout(
+                document_path, ["layout"], content_hash=content_hash
+            )
+        submission = await asyncio.to_thread(compute_fingerprint, document_path, layout, content_hash)
+
+        if template_ids is None:
+            candidates = await self.find_candidates(submission, top_k)
+            template_ids = [candidate.template_id for candidate in candidates]
+        else:
+            await self._ensure_loaded()
+        templates = {
+            template_id: self.index.get(template_id)
+            for template_id in template_ids
+            if template_id in self.index
+        }
+        if not templates:
+            return []
+        return await asyncio.to_thread(self.scorer.score_templates, submission, templates)
+
+    def _save_template(self, template_id: str, fingerprint: DocumentFingerprint, metadata: Dict[str, Any]):
+        self.storage.put_bytes(TEMPLATES_AREA, f"{template_id}/{FINGERPRINT_FILENAME}", fingerprint.to_bytes())
+        self.storage.put_bytes(
+            TEMPLATES_AREA, f"{template_id}/{METADATA_FILENAME}", json.dumps(metadata, indent=2).encode()
+        )
+
+    async def _ensure_loaded(self):
+        """Load persisted fingerprints into the index once."""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                fingerprints = await asyncio.to_thread(self._load_fingerprints)
+                for template_id, fingerprint in fingerprints.items():
+                    if template_id not in self.index:
+                        self.index.add(template_id, fingerprint)
+                self._loaded = True
+                logger.info(f"Loaded {len(fingerprints)} template fingerprints")
+
+    def _load_fingerprints(self) -> Dict[str, DocumentFingerprint]:
+        fingerprints = {}
+        for key in self.storage.list_keys(TEMPLATES_AREA):
+            template_id, _, filename = key.partition("/")
+            if filename != FINGERPRINT_FILENAME:
+                continue
+            try:
+                fingerprints[template_id] = DocumentFingerprint.from_bytes(self.storage.get_bytes(TEMPLATES_AREA, key))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable template fingerprint {key}: {e}")
+        return fingerprints
@@ -0,0 +1,201 @@
+"""
+Upload service for streaming document uploads.
+Request bodies are written to TEMP_PATH chunk by chunk while the SHA-256 and
+size are computed, the file type is checked against its magic bytes, and the
+finished file is moved into a content-addressed store, so every distinct file
+is stored once and its hash can key analysis caching. With a remote storage
+backend the file is also uploaded there.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+import aiofiles
+import aiofiles.os
+
+from app.config import settings
+from app.core.exceptions import DocumentComplianceException
+from app.core.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes identifying each supported file type
+MAGIC_NUMBERS = {
+    "pdf": (b"%PDF-",),
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "jpg": (b"\xff\xd8\xff",),
+    "docx": (b"PK\x03\x04",),
+    "doc": (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",),
+}
+
+# Extensions that name the same file type
+EXTENSION_ALIASES = {"jpeg": "jpg"}
+
+# Bytes needed to identify any type in MAGIC_NUMBERS
+SNIFF_SIZE = max(len(magic) for magics in MAGIC_NUMBERS.values() for magic in magics)
+
+
+@dataclass
+class StoredUpload:
+    """A file in the content-addressed store."""
+    content_hash: str  # SHA-256 hex digest
+    key: str  # Key in the "documents" storage area
+    path: str  # Local working copy
+    size: int
+    extension: str
+    filename: str  # Name the file was uploaded under
+    duplicate: bool  # True when identical content was already stored
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def sniff_file_type(head: bytes) -> Optional[str]:
+    """Identify a file type from its first bytes; text is reported as "tex"."""
+    for file_type, magics in MAGIC_NUMBERS.items():
+        if head.startswith(magics):
+            return file_type
+    if b"\x00" not in head:
+        try:
+            head.decode("utf-8")
+            return "tex"
+        except UnicodeDecodeError as e:
+            # A multi-byte character cut off by the sniff window is still text
+            if e.start >= len(head) - 3:
+                return "tex"
+    return None
+
+
+class UploadService:
+    """Service for streaming uploads into a content-addressed store."""
+
+    def __init__(
+        self,
+        store_path: Optional[str] = None,
+        temp_path: Optional[str] = None,
+        max_size: Optional[int] = None,
+        allowed_extensions: Optional[List[str]] = None
+    ):
+        self.store_path = Path(store_path or settings.DOCUMENTS_PATH)
+        self.temp_path = Path(temp_path or settings.TEMP_PATH)
+        self.max_size = max_size or settings.MAX_UPLOAD_SIZE
+        self.allowed_types = {
+            EXTENSION_ALIASES.get(ext.lower(), ext.lower())
+            for ext in (allowed_extensions or settings.ALLOWED_EXTENSIONS)
+        }
+
+    def key_for(self, content_hash: str, extension: str) -> str:
+        """Storage key of content, fanned out over two directory levels."""
+        return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.{extension}"
+
+    def path_for(self, content_hash: str, extension: str) -> Path:
+        """Local location of stored content."""
+        return self.store_path / self.key_for(content_hash, extension)
+
+    def check_declared_size(self, content_length: Optional[int]):
+        """Reject a request whose declared body size is over the limit before reading it."""
+        if content_length is not None and content_length > self.max_size:
+            raise self._too_large()
+
+    async def save_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_length: Optional[int] = None
+    ) -> StoredUpload:
+        """Store a streamed upload and return where it ended up.
+
+        The file type is taken from the content's magic bytes and must match
+        the filename's extension and ALLOWED_EXTENSIONS (415). Bodies over
+        MAX_UPLOAD_SIZE are rejected as soon as the limit is crossed (413).
+        """
+        self.check_declared_size(content_length)
+        extension = os.path.splitext(filename)[1].lstrip(".").lower()
+        declared_type = EXTENSION_ALIASES.get(extension, extension)
+        if declared_type not in self.allowed_types:
+            raise self._unsupported(f"File type '.{extension}' is not allowed")
+
+        self.temp_path.mkdir(parents=True, exist_ok=True)
+        temp_file = self.temp_path / f"upload-{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        try:
+            async with aiofiles.open(temp_file, "wb") as f:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise self._too_large()
+
+                    # Check the type once enough of the body has arrived
+                    if len(head) < SNIFF_SIZE:
+                        head += chunk[:SNIFF_SIZE - len(head)]
+                        if len(head) >= SNIFF_SIZE:
+                            self._check_type(head, declared_type)
+
+                    digest.update(chunk)
+                    await f.write(chunk)
+
+            if size == 0:
+                raise DocumentComplianceException("Uploaded file is empty", status_code=400)
+            if len(head) < SNIFF_SIZE:
+                self._check_type(head, declared_type)
+
+            content_hash = digest.hexdigest()
+            stored_path = self.path_for(content_hash, declared_type)
+            duplicate = await aiofiles.os.path.exists(stored_path)
+            if duplicate:
+                await aiofiles.os.remove(temp_file)
+            else:
+                await aiofiles.os.makedirs(stored_path.parent, exist_ok=True)
+                # Same filesystem, so concurrent identical uploads replace each other atomically
+                await aiofiles.os.replace(temp_file, stored_path)
+        except BaseException:
+            if await aiofiles.os.path.exists(temp_file):
+                await aiofiles.os.remove(temp_file)
+            raise
+
+        key = self.key_for(content_hash, declared_type)
+        storage = get_storage()
+        if storage.name != "local" and not duplicate:
+            # Large files go up as parallel multipart uploads
+            await asyncio.to_thread(storage.put_file, "documents", key, str(stored_path))
+
+        logger.info(
+            f"Stored upload {filename} ({size} bytes) as {content_hash}"
+            f"{' (duplicate)' if duplicate else ''}"
+        )
+        return StoredUpload(
+            content_hash=content_hash,
+            key=key,
+            path=str(stored_path),
+            size=size,
+            extension=declared_type,
+            filename=os.path.basename(filename),
+            duplicate=duplicate
+        )
+
+    def _check_type(self, head: bytes, declared_type: str):
+        detected_type = sniff_file_type(head)
+        if detected_type != declared_type:
+            raise self._unsupported(
+                f"File content does not match its '.{declared_type}' extension"
+            )
+
+    def _too_large(self) -> DocumentComplianceException:
+        return DocumentComplianceException(
+            f"Upload exceeds the maximum size of {self.max_size} bytes", status_code=413
+        )
+
+    def _unsupported(self, message: str) -> DocumentComplianceException:
+        return DocumentComplianceException(
+            f"{message}. Allowed: {', '.join(sorted(self.allowed_types))}", status_code=415
+        )
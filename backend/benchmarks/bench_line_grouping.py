@@ -0,0 +1,99 @@
+"""
+Benchmark line grouping on straight and skewed pages
+
+Builds a synthetic page of word boxes (lines at a fixed pitch, rotated by
+each skew angle) and checks that word_table.group_lines still finds one line
+per text line, reporting the time per page.
+
+Usage (from backend/):
+    python -m benchmarks.bench_line_grouping
+    python -m benchmarks.bench_line_grouping --lines 60 --words 20 --skews 0 1 2 3
+"""
+
+import argparse
+import math
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from app.core.word_table import WordTable, group_lines
+
+
+def skewed_page(
+    lines: int = 30,
+    words: int = 15,
+    skew_degrees: float = 0.0,
+    pitch: float = 60.0,
+    word_height: float = 24.0,
+    seed: int = 0
+) -> WordTable:
+    """Word boxes of a page whose lines are rotated by skew_degrees around the top-left margin"""
+    rng = np.random.default_rng(seed)
+    angle = math.radians(skew_degrees)
+    texts: List[str] = []
+    columns = {"x": [], "y": [], "width": [], "height": []}
+    for line in range(lines):
+        x = 200.0
+        for word in range(words):
+            width = float(rng.integers(40, 120))
+            # Rotate the word's top-left corner; boxes stay axis-aligned like OCR output
+            base_y = 300.0 + line * pitch
+            columns["x"].append(200.0 + (x - 200.0) * math.cos(angle))
+            columns["y"].append(base_y + (x - 200.0) * math.sin(angle))
+            columns["width"].append(width)
+            columns["height"].append(word_height)
+            texts.append(f"l{line}w{word}")
+            x += width + 25.0
+    return WordTable.from_columns(
+        texts, columns["x"], columns["y"], columns["width"], columns["height"], np.ones(len(texts))
+    )
+
+
+def line_purity(table: WordTable, words: WordTable) -> float:
+    """Fraction of found lines whose words all come from the same text line"""
+    pure = 0
+    for start, end in zip(table.starts[:-1], table.starts[1:]):
+        sources = {words.text[i].split("w")[0] for i in table.order[start:end].tolist()}
+        pure += len(sources) == 1
+    return pure / max(len(table), 1)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=30, help="Text lines per page")
+    parser.add_argument("--words", type=int, default=15, help="Words per line")
+    parser.add_argument("--skews", type=float, nargs="+", default=[0.0, 0.5, 1.0, 2.0, 3.0],
+                        help="Skew angles to test, in degrees")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per page")
+    args = parser.parse_args(argv)
+
+    print(f"{'skew':>5} {'lines':>6} {'expected':>9} {'purity':>7} {'ms/page':>8}")
+    failed = False
+    for skew in args.skews:
+        words = skewed_page(args.lines, args.words, skew)
+        lines = group_lines(words)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            group_lines(words)
+        elapsed = (time.perf_counter() - start) / args.repeat
+
+        purity = line_purity(lines, words)
+        ok = len(lines) == args.lines and purity == 1.0
+        failed |= not ok
+        print(
+            f"{skew:>5.1f} {len(lines):>6} {args.lines:>9} {purity:>7.2f} "
+            f"{elapsed * 1000:>8.2f}{'' if ok else '  FAIL'}"
+        )
+
+    if failed:
+        print("FAIL: line grouping split or merged text lines")
+        return 1
+    print("OK: one line per text line at every skew")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
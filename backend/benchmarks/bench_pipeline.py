@@ -0,0 +1,348 @@
+"""
+Per-stage benchmark of the document analysis pipeline
+
+Generates synthetic PDFs with reportlab (varying page count, text density and
+tables per page), then for each one times page rasterization, every page
+analysis stage and the end-to-end analyze_document_layout() call, with the
+analysis caches disabled. Each scenario runs in a fresh process so its peak
+RSS is its own. Results are compared against a stored baseline and the run
+fails when a stage gets slower, or memory grows, beyond the threshold.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --scenarios p1-sparse-t0 p10-dense-t2 --repeat 5
+    python -m benchmarks.bench_pipeline --update-baseline
+    python -m benchmarks.bench_pipeline --threshold 0.15 --json results.json
+    python -m benchmarks.bench_pipeline --ci   # also fail when there is no baseline
+
+The baseline is machine-specific and not committed; record it with
+--update-baseline on the machine that runs the comparison. --ci is the
+default when the CI environment variable is set.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+DEFAULT_BASELINE = Path(__file__).with_name("pipeline_baseline.json")
+DEFAULT_FEATURES = ["layout", "text", "tables", "style"]
+
+# Timings below this are dominated by noise and never count as regressions
+MIN_COMPARED_SECONDS = 0.005
+
+# Paragraphs per page and words per paragraph for each text density
+TEXT_DENSITIES = {
+    "sparse": (2, 25),
+    "normal": (5, 60),
+    "dense": (9, 110),
+}
+
+VOCABULARY = (
+    "document compliance template layout section clause policy review "
+    "approval signature revision annex schedule report summary figure "
+    "table header footer margin paragraph reference standard requirement "
+    "the of and to in for with on by as is are be this that"
+).split()
+
+
+@dataclass(frozen=True)
+class Scenario:
+    pages: int
+    density: str
+    tables: int  # Tables per page
+
+    @property
+    def name(self) -> str:
+        return f"p{self.pages}-{self.density}-t{self.tables}"
+
+    @classmethod
+    def parse(cls, name: str) -> "Scenario":
+        """Parse a name such as "p10-dense-t2"."""
+        try:
+            pages, density, tables = name.split("-")
+            scenario = cls(int(pages.lstrip("p")), density, int(tables.lstrip("t")))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid scenario '{name}', expected e.g. p10-dense-t2")
+        if scenario.density not in TEXT_DENSITIES:
+            raise argparse.ArgumentTypeError(
+                f"Unsupported density '{scenario.density}'. Options: {', '.join(TEXT_DENSITIES)}"
+            )
+        return scenario
+
+
+DEFAULT_SCENARIOS = [
+    Scenario(1, "sparse", 0),
+    Scenario(1, "dense", 2),
+    Scenario(5, "normal", 1),
+    Scenario(10, "dense", 2),
+    Scenario(20, "normal", 0),
+]
+
+
+def generate_pdf(scenario: Scenario, path: str, seed: int = 0):
+    """Write an A4 PDF with a heading, paragraphs and ruled tables on every page"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    rng = random.Random(seed)
+    styles = getSampleStyleSheet()
+    paragraphs, words_per_paragraph = TEXT_DENSITIES[scenario.density]
+
+    def sentence(count: int) -> str:
+        return " ".join(rng.choice(VOCABULARY) for _ in range(count)).capitalize() + "."
+
+    story = []
+    for page_num in range(1, scenario.pages + 1):
+        story.append(Paragraph(f"Section {page_num}: {sentence(4)}", styles["Heading1"]))
+        for index in range(paragraphs):
+            story.append(Paragraph(sentence(words_per_paragraph), styles["BodyText"]))
+            if index < scenario.tables:
+                rows = [[f"Column {c + 1}" for c in range(4)]]
+                rows += [[sentence(2)[:-1] for _ in range(4)] for _ in range(4)]
+                table = Table(rows, colWidths=[4 * cm] * 4)
+                table.setStyle(TableStyle([
+                    ("GRID", (0, 0), (-1, -1), 0.75, colors.black),
+                    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+                    ("FONTSIZE", (0, 0), (-1, -1), 8),
+                ]))
+                story.extend([Spacer(1, 0.3 * cm), table, Spacer(1, 0.3 * cm)])
+        story.append(PageBreak())
+
+    # Dense pages overflow onto extra pages, so page counts are approximate
+    SimpleDocTemplate(path, pagesize=A4).build(story[:-1])
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _timed(name: str, compute, timings: Dict[str, float]):
+    """Wrap a stage so its own time (excluding its inputs) is added to timings[name]"""
+    def run(*args):
+        start = time.perf_counter()
+        try:
+            return compute(*args)
+        finally:
+            timings[name] += time.perf_counter() - start
+    return run
+
+
+def time_stages(client, pdf_path: str, features: List[str]) -> Dict[str, float]:
+    """Run every page through the stage graph sequentially, timing each stage"""
+    from app.core.page_pipeline import Stage
+
+    timings: Dict[str, float] = defaultdict(float)
+    original_stages = client.page_stages
+    client.page_stages = {
+        name: Stage(_timed(name, stage.compute, timings), stage.inputs, stage.optional_inputs)
+        for name, stage in original_stages.items()
+    }
+    try:
+        pages = client._iter_pages(pdf_path, extract_text=client._needs_words(features))
+        page_num = 0
+        while True:
+            # Rendering and reading the text layer happen as the iterator advances
+            start = time.perf_counter()
+            try:
+                raster, native_text = next(pages)
+            except StopIteration:
+                break
+            timings["render"] += time.perf_counter() - start
+            page_num += 1
+            try:
+                page_data = client._analyze_page_sync(raster, native_text, page_num, features)
+                start = time.perf_counter()
+                client._materialize_page(page_data)
+                timings["materialize"] += time.perf_counter() - start
+            finally:
+                raster.close()
+    finally:
+        client.page_stages = original_stages
+    return dict(timings)
+
+
+def run_scenario(scenario: Scenario, features: List[str], repeat: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Benchmark one scenario (run in a child process so peak RSS is per scenario)"""
+    from app.core.opensource_document_client import OpenSourceDocumentClient
+
+    client = OpenSourceDocumentClient({
+        **config,
+        "cache_enabled": False,
+        "page_cache_enabled": False,
+        "page_workers": 0,
+    })
+
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, f"{scenario.name}.pdf")
+        start = time.perf_counter()
+        generate_pdf(scenario, pdf_path)
+        generate_time = time.perf_counter() - start
+
+        # Warm-up loads the layout model and OCR engine outside the measurements
+        rss_before = peak_rss_mb()
+        client.preload()
+        client.analyze_document_layout_sync(pdf_path, features)
+        rss_model = peak_rss_mb()
+
+        stage_runs = defaultdict(list)
+        for _ in range(repeat):
+            for name, elapsed in time_stages(client, pdf_path, features).items():
+                stage_runs[name].append(elapsed)
+            start = time.perf_counter()
+            result = client.analyze_document_layout_sync(pdf_path, features)
+            stage_runs["end_to_end"].append(time.perf_counter() - start)
+
+    pages = len(result["pages"])
+    end_to_end = median(stage_runs["end_to_end"])
+    return {
+        "scenario": scenario.name,
+        "pages": pages,
+        "words": sum(len(page.get("words", [])) for page in result["pages"]),
+        "tables": len(result.get("tables", [])),
+        "generate_seconds": generate_time,
+        "seconds": {name: median(runs) for name, runs in stage_runs.items()},
+        "seconds_per_page": end_to_end / max(pages, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "startup_rss_mb": rss_before,
+        "model_rss_mb": rss_model,
+    }
+
+
+def _run_isolated(args) -> Dict[str, Any]:
+    return run_scenario(*args)
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float, rss_threshold: float) -> List[str]:
+    """Return a message for every stage or memory figure that regressed past its threshold"""
+    regressions = []
+    for result in results:
+        base = baseline.get("scenarios", {}).get(result["scenario"])
+        if base is None:
+            continue
+        for stage, seconds in result["seconds"].items():
+            base_seconds = base["seconds"].get(stage)
+            if base_seconds is None or max(seconds, base_seconds) < MIN_COMPARED_SECONDS:
+                continue
+            if seconds > base_seconds * (1 + threshold):
+                regressions.append(
+                    f"{result['scenario']} {stage}: {seconds:.3f}s vs baseline {base_seconds:.3f}s "
+                    f"(+{(seconds / base_seconds - 1) * 100:.0f}%)"
+                )
+        base_rss = base.get("peak_rss_mb")
+        if base_rss and result["peak_rss_mb"] > base_rss * (1 + rss_threshold):
+            regressions.append(
+                f"{result['scenario']} peak RSS: {result['peak_rss_mb']:.0f} MB vs baseline {base_rss:.0f} MB "
+                f"(+{(result['peak_rss_mb'] / base_rss - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def print_results(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]]):
+    stages = []
+    for result in results:
+        stages.extend(stage for stage in result["seconds"] if stage not in stages)
+    stages.sort(key=lambda stage: (stage == "end_to_end", stage))
+    scenarios = (baseline or {}).get("scenarios", {})
+
+    for result in results:
+        base = scenarios.get(result["scenario"], {}).get("seconds", {})
+        print(
+            f"\n{result['scenario']}: {result['pages']} pages, {result['words']} words, "
+            f"{result['tables']} tables, peak RSS {result['peak_rss_mb']:.0f} MB, "
+            f"{result['seconds_per_page']:.3f} s/page"
+        )
+        print(f"  {'stage':<18} {'seconds':>9} {'baseline':>9} {'change':>8}")
+        for stage in stages:
+            if stage not in result["seconds"]:
+                continue
+            seconds = result["seconds"][stage]
+            base_seconds = base.get(stage)
+            if base_seconds:
+                print(f"  {stage:<18} {seconds:>9.3f} {base_seconds:>9.3f} {(seconds / base_seconds - 1) * 100:>+7.0f}%")
+            else:
+                print(f"  {stage:<18} {seconds:>9.3f} {'-':>9} {'':>8}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", type=Scenario.parse, default=DEFAULT_SCENARIOS,
+                        help="Scenarios as p<pages>-<density>-t<tables per page> "
+                             f"(densities: {', '.join(TEXT_DENSITIES)})")
+    parser.add_argument("--features", nargs="+", default=DEFAULT_FEATURES, help="Analysis features to request")
+    parser.add_argument("--text-mode", default=None, help="Override TEXT_EXTRACTION_MODE (e.g. ocr)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario; the median is reported")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Fail if a stage is slower than baseline by more than this fraction")
+    parser.add_argument("--rss-threshold", type=float, default=0.20,
+                        help="Fail if peak RSS exceeds baseline by more than this fraction")
+    parser.add_argument("--json", type=Path, default=None, help="Also write the results to this file")
+    parser.add_argument("--ci", action="store_true", default=bool(os.environ.get("CI")),
+                        help="Fail when no baseline exists instead of only reporting timings")
+    args = parser.parse_args(argv)
+
+    config = {"text_mode": args.text_mode} if args.text_mode else {}
+    # A fresh interpreter per scenario keeps ru_maxrss from carrying over
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for scenario in args.scenarios:
+        print(f"Running {scenario.name}...", flush=True)
+        with context.Pool(1) as pool:
+            results.append(pool.apply(_run_isolated, ((scenario, args.features, args.repeat, config),)))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "features": args.features,
+        "repeat": args.repeat,
+        "scenarios": {result["scenario"]: result for result in results},
+    }
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    baseline = None
+    if args.baseline.exists() and not args.update_baseline:
+        baseline = json.loads(args.baseline.read_text())
+    print_results(results, baseline)
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return 1 if args.ci else 0
+    if baseline.get("features") != args.features:
+        print(f"\nWARNING: baseline was recorded with features {baseline.get('features')}")
+
+    regressions = compare(results, baseline, args.threshold, args.rss_threshold)
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} regression(s) beyond threshold")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"\nOK: no stage slower than baseline by more than {args.threshold:.0%}, "
+          f"no peak RSS growth beyond {args.rss_threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Benchmark sampled vs full-page dominant color analysis
+
+Compares OpenSourceDocumentClient._dominant_colors in "full" mode (k-means
+over every pixel, the previous behaviour) against "sampled" mode, reporting
+the time per page and how far the sampled colors drift from the full ones.
+
+Usage (from backend/):
+    python -m benchmarks.bench_style_colors
+    python -m benchmarks.bench_style_colors path/to/document.pdf --budget 20000
+"""
+
+import argparse
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+from scipy.optimize import linear_sum_assignment
+
+from app.core.opensource_document_client import OpenSourceDocumentClient
+
+
+def synthetic_pages(count: int = 3, size: Tuple[int, int] = (2480, 3508)) -> List[Image.Image]:
+    """Render A4 pages at 300 DPI with text-like bars, a header band and figures"""
+    rng = np.random.default_rng(0)
+    pages = []
+    for page_num in range(count):
+        image = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(image)
+
+        # Colored header band
+        draw.rectangle([0, 0, size[0], 250], fill=(20, 60, 140))
+
+        # Lines of "text"
+        for y in range(400, size[1] - 300, 60):
+            x = 200
+            while x < size[0] - 300:
+                word = int(rng.integers(60, 220))
+                draw.rectangle([x, y, x + word, y + 30], fill=(30, 30, 30))
+                x += word + 25
+
+        # Figures with noisy fills
+        for _ in range(2 + page_num):
+            x0 = int(rng.integers(200, size[0] - 800))
+            y0 = int(rng.integers(600, size[1] - 800))
+            color = rng.integers(0, 255, 3)
+            block = np.clip(
+                color + rng.normal(0, 12, (600, 600, 3)), 0, 255
+            ).astype(np.uint8)
+            image.paste(Image.fromarray(block), (x0, y0))
+
+        pages.append(image)
+    return pages
+
+
+def pdf_pages(path: str) -> List[Image.Image]:
+    client = OpenSourceDocumentClient({"cache_enabled": False, "page_cache_enabled": False})
+    return client._pdf_to_images(path)
+
+
+def color_deviation(image_np: np.ndarray, full: np.ndarray, sampled: np.ndarray) -> Tuple[float, float]:
+    """Return (max, pixel-weighted mean) RGB distance between matched color sets
+
+    Colors are paired with the Hungarian algorithm; weights are each full
+    color's share of the page, measured on a fixed subsample.
+    """
+    cost = np.linalg.norm(full[:, None, :] - sampled[None, :, :], axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    distances = cost[rows, cols]
+
+    pixels = image_np.reshape(-1, 3)[::97].astype(np.float64)
+    nearest = np.argmin(np.linalg.norm(pixels[:, None, :] - full[None, :, :], axis=2), axis=1)
+    shares = np.bincount(nearest, minlength=len(full)) / len(nearest)
+
+    return float(distances.max()), float((distances * shares[rows]).sum())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", help="PDF to benchmark (default: synthetic pages)")
+    parser.add_argument("--budget", type=int, default=None, help="Pixel budget for sampled mode")
+    parser.add_argument("--max-deviation", type=float, default=8.0,
+                        help="Fail if the weighted mean color deviation exceeds this (RGB units)")
+    args = parser.parse_args(argv)
+
+    sampled_config = {"style_color_mode": "sampled", "cache_enabled": False, "page_cache_enabled": False}
+    if args.budget:
+        sampled_config["style_color_pixel_budget"] = args.budget
+    full_client = OpenSourceDocumentClient({"style_color_mode": "full", "cache_enabled": False, "page_cache_enabled": False})
+    sampled_client = OpenSourceDocumentClient(sampled_config)
+
+    pages = pdf_pages(args.pdf) if args.pdf else synthetic_pages()
+
+    print(f"{'page':>4} {'full (s)':>9} {'sampled (s)':>12} {'speedup':>8} {'max dev':>8} {'mean dev':>9}")
+    worst = 0.0
+    for page_num, image in enumerate(pages, 1):
+        image_np = np.array(image.convert("RGB"))
+
+        start = time.perf_counter()
+        full = full_client._dominant_colors(image_np).astype(np.float64)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sampled = sampled_client._dominant_colors(image_np).astype(np.float64)
+        sampled_time = time.perf_counter() - start
+
+        max_dev, mean_dev = color_deviation(image_np, full, sampled)
+        worst = max(worst, mean_dev)
+        print(
+            f"{page_num:>4} {full_time:>9.2f} {sampled_time:>12.3f} "
+            f"{full_time / sampled_time:>7.1f}x {max_dev:>8.1f} {mean_dev:>9.2f}"
+        )
+
+    if worst > args.max_deviation:
+        print(f"FAIL: weighted color deviation {worst:.2f} exceeds {args.max_deviation}")
+        return 1
+    print(f"OK: weighted color deviation {worst:.2f} within {args.max_deviation}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())